@@ -1,5 +1,8 @@
 import streamlit as st
 
+from scripts.timing import timed
+
+@timed('tab.about')
 def introduction():
     st.title('Keboola QSR 360 Solution')
     st.write("Own your data, automate workflows, and drive smarter decisions across all restaurant initiatives.")
@@ -5,8 +5,12 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import plotly.express as px
 
+from scripts.export import export_button
+from scripts.timeseries import choose_resolution, downsample, period_start, rating_color, render_mode
+from scripts.timing import timed
 from scripts.viz import sentiment_color
 
+@timed('ai_analysis.network_graph')
 def create_network_graph(attributes, slider_entities):
     # Get top entities by total attribute counts
     pivot_attrs = attributes.pivot(index='entity', columns='attribute', values='count').fillna(0)
@@ -118,42 +122,52 @@ def display_network_graph(attributes):
     col1.pyplot(fig, use_container_width=True)
 
 
-def ai_analysis(data, attributes, sentences, entities):
-    ## SENTIMENT COUNT BY DATE
-    data['REVIEW_DATE'] = pd.to_datetime(data['REVIEW_DATE']).dt.date
-    avg_rating_per_day = data.groupby('REVIEW_DATE')['RATING'].mean().reset_index()
-    color_scale = avg_rating_per_day['RATING'].apply(lambda x: '#EA4335' if x < 1.5 else '#e98f41' if x < 2.5 else '#FBBC05' if x < 3.6 else '#a5c553' if x < 4.5 else '#34A853').tolist()
+def average_rating_per_period(data, resolution):
+    return data.groupby(period_start(data['REVIEW_DATE'], resolution))['RATING'].mean().reset_index()
+
+def detailed_rating_per_period(data, resolution):
+    return (
+        data.groupby(period_start(data['REVIEW_DATE'], resolution))[['REVIEW_DETAILED_FOOD', 'REVIEW_DETAILED_SERVICE', 'REVIEW_DETAILED_ATMOSPHERE']]
+        .mean()
+        .round(2)
+        .rename(columns={
+            'REVIEW_DETAILED_FOOD': 'Food',
+            'REVIEW_DETAILED_SERVICE': 'Service', 
+            'REVIEW_DETAILED_ATMOSPHERE': 'Atmosphere'
+        })
+    )
+
+def average_rating_figure(avg_rating_per_day, resolution):
+    avg_rating_per_day = downsample(avg_rating_per_day, 'REVIEW_DATE', 'RATING')
+    color_scale = rating_color(avg_rating_per_day['RATING'])
 
     fig_avg_rating_per_day = px.line(
         avg_rating_per_day,
         x='REVIEW_DATE',
         y='RATING',
         labels={'RATING': 'Average Rating', 'REVIEW_DATE': 'Date'},
-        title='Average Rating per Date',
-        height=300
+        title=f'Average Rating per {resolution}' if resolution != 'Day' else 'Average Rating per Date',
+        height=300,
+        render_mode=render_mode(len(avg_rating_per_day))
     )
     fig_avg_rating_per_day.update_traces(mode='lines+markers', hovertemplate='Avg Rating: %{y:.2f}<extra></extra>', line=dict(color='#E6E6E6'), marker=dict(color=color_scale))  
     fig_avg_rating_per_day.update_layout(xaxis_title=None, yaxis_title=None, hovermode='x')
-    st.plotly_chart(fig_avg_rating_per_day, use_container_width=True)
+    return fig_avg_rating_per_day
 
-    ## AVERAGE DETAILED RATING BY DATE
-    avg_detailed_rating_by_date = (
-        data.groupby('REVIEW_DATE')[['REVIEW_DETAILED_FOOD', 'REVIEW_DETAILED_SERVICE', 'REVIEW_DETAILED_ATMOSPHERE']]
-        .mean()
-        .round(2)
-        .rename(columns={
-            'REVIEW_DETAILED_FOOD': 'Food',
-            'REVIEW_DETAILED_SERVICE': 'Service', 
-            'REVIEW_DETAILED_ATMOSPHERE': 'Atmosphere'
-        })
-    )
+def detailed_rating_figure(avg_detailed_rating_by_date, resolution):
+    avg_detailed_rating_by_date = avg_detailed_rating_by_date.reset_index().melt(id_vars='REVIEW_DATE', value_vars=['Food', 'Service', 'Atmosphere'])
+    avg_detailed_rating_by_date = pd.concat([
+        downsample(series, 'REVIEW_DATE', 'value') for _, series in avg_detailed_rating_by_date.groupby('variable', sort=False)
+    ])
     fig_avg_detailed_rating_by_date = px.line(
         avg_detailed_rating_by_date,
-        x=avg_detailed_rating_by_date.index,
-        y=['Food', 'Service', 'Atmosphere'],
+        x='REVIEW_DATE',
+        y='value',
+        color='variable',
         labels={'x': 'Date', 'value': 'Avg Score', 'variable': 'Avg Rating', 'REVIEW_DATE': 'Date'},
-        title='Average Detailed Rating by Date',
-        height=300 
+        title=f'Average Detailed Rating by {resolution}' if resolution != 'Day' else 'Average Detailed Rating by Date',
+        height=300,
+        render_mode=render_mode(len(avg_detailed_rating_by_date))
     )
 
     blue_shades = ['#57aeff', '#0a89ff', '#bddfff']
@@ -162,7 +176,47 @@ def ai_analysis(data, attributes, sentences, entities):
 
     fig_avg_detailed_rating_by_date.update_traces(mode='lines+markers', hovertemplate='Avg Rating: %{y:.2f}<extra></extra>')
     fig_avg_detailed_rating_by_date.update_layout(xaxis_title=None, yaxis_title=None, hovermode='x')
-    st.plotly_chart(fig_avg_detailed_rating_by_date)
+    return fig_avg_detailed_rating_by_date
+
+def top_entities(sentences, entities, sentiment, count):
+    filtered_entities = entities[entities['SENTENCE_ID'].isin(sentences[sentences['SENTENCE_SENTIMENT'] == sentiment]['SENTENCE_ID'])]
+    return filtered_entities['ENTITY'].value_counts().head(count).sort_values(ascending=True)
+
+def entity_figure(entity_counts, title, color, text_color=None):
+    fig = px.bar(
+        entity_counts,
+        x=entity_counts.values,
+        y=entity_counts.index,
+        orientation='h',
+        title=title,
+        text=entity_counts.values
+    )
+    fig.update_layout(
+        xaxis_title=None,
+        yaxis_title=None,
+        hovermode=False
+    )
+    fig.update_traces(
+        marker_color=color,
+        textposition='inside',
+        **({'textfont_color': text_color} if text_color else {})
+    )
+    return fig
+
+
+@timed('tab.ai_analysis')
+def ai_analysis(data, attributes, sentences, entities):
+    ## SENTIMENT COUNT BY DATE
+    data['REVIEW_DATE'] = pd.to_datetime(data['REVIEW_DATE'])
+    # Long ranges are averaged per week or month, then thinned with LTTB so the payload stays bounded
+    resolution = choose_resolution(data['REVIEW_DATE'].min(), data['REVIEW_DATE'].max())
+    avg_rating_per_day = average_rating_per_period(data, resolution)
+    data['REVIEW_DATE'] = data['REVIEW_DATE'].dt.date
+    st.plotly_chart(average_rating_figure(avg_rating_per_day, resolution), use_container_width=True)
+
+    ## AVERAGE DETAILED RATING BY DATE
+    avg_detailed_rating_by_date = detailed_rating_per_period(data, resolution)
+    st.plotly_chart(detailed_rating_figure(avg_detailed_rating_by_date, resolution))
     
     ## ENTITY-ATTRIBUTE RELATIONS
     st.divider()
@@ -201,53 +255,16 @@ def ai_analysis(data, attributes, sentences, entities):
             sentences = sentences[sentences['TOPIC'].isin(selected_topic)]
 
         with col2:
-            filtered_entities = entities[entities['SENTENCE_ID'].isin(sentences[sentences['SENTENCE_SENTIMENT'] == 'Positive']['SENTENCE_ID'])]
-            positive_entities = filtered_entities['ENTITY'].value_counts().head(entities_x).sort_values(ascending=True)
+            positive_entities = top_entities(sentences, entities, 'Positive', entities_x)
             if not positive_entities.empty:
-                fig_positive = px.bar(
-                    positive_entities,
-                    x=positive_entities.values,
-                    y=positive_entities.index,
-                    orientation='h',
-                    title='Positive Entities',
-                    text=positive_entities.values
-                )
-                fig_positive.update_layout(
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    hovermode=False
-                )
-                fig_positive.update_traces(
-                    marker_color='#34A853',
-                    textposition='inside'
-                )
-                st.plotly_chart(fig_positive)
+                st.plotly_chart(entity_figure(positive_entities, 'Positive Entities', '#34A853'))
             else:
                 st.info("No positive entities found for the selected filters.", icon=':material/info:')
                 
         with col3:
-            filtered_entities = entities[entities['SENTENCE_ID'].isin(sentences[sentences['SENTENCE_SENTIMENT'] == 'Negative']['SENTENCE_ID'])]
-            negative_entities = filtered_entities['ENTITY'].value_counts().head(entities_x).sort_values(ascending=True)
+            negative_entities = top_entities(sentences, entities, 'Negative', entities_x)
             if not negative_entities.empty:
-                fig_negative = px.bar(
-                    negative_entities,
-                    x=negative_entities.values,
-                    y=negative_entities.index,
-                    orientation='h',
-                    title='Negative Entities',
-                    text=negative_entities.values
-                )
-                fig_negative.update_layout(
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    hovermode=False
-                )
-                fig_negative.update_traces(
-                    marker_color='#EA4335',
-                    textfont_color='white',
-                    textposition='inside'
-                )
-                st.plotly_chart(fig_negative)
+                st.plotly_chart(entity_figure(negative_entities, 'Negative Entities', '#EA4335', text_color='white'))
             else:
                 st.info("No negative entities found for the selected filters.", icon=':material/info:')
 
@@ -309,5 +326,7 @@ def ai_analysis(data, attributes, sentences, entities):
                     column_order=columns,
                     hide_index=True, 
                     use_container_width=True)
+        # The list columns are rebuilt chunk by chunk from the filtered sentences when exporting
+        export_button(filtered_review_data[columns], 'review_details', sentences=sentences, entities=entities, key='review_details_export')
     
     entity_classification(data, sentences, entities)
\ No newline at end of file
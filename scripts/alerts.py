@@ -0,0 +1,240 @@
+# Usage: python -m scripts.alerts REVIEWS_CSV [--table TABLE_ID]
+import argparse
+import math
+import threading
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from scripts.sapi import write_table
+from scripts.timing import timed
+
+SHORT_DAYS = 7
+LONG_DAYS = 30
+BASELINE_DAYS = LONG_DAYS - SHORT_DAYS
+# One-sided, roughly p < 0.01
+Z_THRESHOLD = 2.33
+MIN_REVIEWS = 5
+MIN_RATING_DROP = 0.5
+MIN_SHARE_RISE = 0.1
+COLUMNS = ('REVIEW_ID', 'PLACE_ID', 'REVIEW_DATE', 'RATING', 'OVERALL_SENTIMENT')
+
+
+class _Window:
+    # Daily buckets of [day, count, rating sum, rating square sum, negatives] with running totals
+    def __init__(self, days):
+        self.days = days
+        self.buckets = deque()
+        self.totals = [0, 0, 0, 0]
+
+    def add(self, day, rating, negative):
+        # Buckets stay sorted by day, a review scraped late is counted on its own day
+        i = len(self.buckets)
+        while i and self.buckets[i - 1][0] > day:
+            i -= 1
+        if i and self.buckets[i - 1][0] == day:
+            bucket = self.buckets[i - 1]
+        else:
+            bucket = [day, 0, 0, 0, 0]
+            self.buckets.insert(i, bucket)
+        for i, value in enumerate((1, rating, rating * rating, negative)):
+            bucket[i + 1] += value
+            self.totals[i] += value
+
+    def evict(self, as_of):
+        while self.buckets and self.buckets[0][0] <= as_of - self.days:
+            bucket = self.buckets.popleft()
+            for i in range(4):
+                self.totals[i] -= bucket[i + 1]
+
+
+def _mean_var(count, total, squares):
+    mean = total / count
+    return mean, max(squares / count - mean * mean, 0) * count / max(count - 1, 1)
+
+
+def _evaluate(short, long):
+    n_s, sum_s, sq_s, neg_s = short
+    n_b, sum_b, sq_b, neg_b = (l - s for l, s in zip(long, short))
+    found = []
+    if n_s >= MIN_REVIEWS and n_b >= MIN_REVIEWS:
+        mean_s, var_s = _mean_var(n_s, sum_s, sq_s)
+        mean_b, var_b = _mean_var(n_b, sum_b, sq_b)
+        z = (mean_s - mean_b) / max(math.sqrt(var_s / n_s + var_b / n_b), 1e-6)
+        if mean_b - mean_s >= MIN_RATING_DROP and z <= -Z_THRESHOLD:
+            found.append(('Rating drop', mean_s, mean_b, z))
+
+        share_s, share_b = neg_s / n_s, neg_b / n_b
+        pooled = (neg_s + neg_b) / (n_s + n_b)
+        z = (share_s - share_b) / max(math.sqrt(pooled * (1 - pooled) * (1 / n_s + 1 / n_b)), 1e-6)
+        if share_s - share_b >= MIN_SHARE_RISE and z >= Z_THRESHOLD:
+            found.append(('Negative share rise', share_s, share_b, z))
+
+    expected = n_b / BASELINE_DAYS * SHORT_DAYS
+    if expected >= MIN_REVIEWS:
+        z = (n_s - expected) / math.sqrt(expected)
+        if z <= -Z_THRESHOLD:
+            found.append(('Review rate drop', n_s / SHORT_DAYS, n_b / BASELINE_DAYS, z))
+    return found
+
+
+class AlertMonitor:
+    def __init__(self):
+        self.windows = {}
+        # Day of every applied review still inside the long window, so late and repeated reviews are told apart
+        self.applied = {}
+        self.version = None
+        self.as_of = None
+        self._lock = threading.Lock()
+
+    def update(self, reviews, version=None):
+        # A batch with the version that was applied last is skipped without looking at its rows
+        with self._lock:
+            if version is not None and version == self.version:
+                return 0
+            dates = pd.to_datetime(reviews['REVIEW_DATE'])
+            as_of = max(dates.max(), self.as_of) if self.as_of is not None else dates.max()
+            new = ~reviews['REVIEW_ID'].isin(list(self.applied)) & reviews['RATING'].notna()
+            new &= dates > as_of.normalize() - pd.Timedelta(days=LONG_DAYS - 1)
+            self.as_of = as_of
+            self.version = version
+            if not new.any():
+                return 0
+            new_dates = dates[new]
+            order = np.argsort(new_dates.values, kind='stable')
+            place_ids = reviews.loc[new, 'PLACE_ID'].values[order]
+            days = new_dates.values.astype('datetime64[D]').astype(int)[order]
+            ratings = reviews.loc[new, 'RATING'].astype(int).values[order]
+            negatives = (reviews.loc[new, 'OVERALL_SENTIMENT'] == 'Negative').values[order]
+            for place_id, day, rating, negative in zip(place_ids, days, ratings, negatives):
+                windows = self.windows.get(place_id)
+                if windows is None:
+                    windows = self.windows[place_id] = (_Window(SHORT_DAYS), _Window(LONG_DAYS))
+                for window in windows:
+                    window.add(int(day), int(rating), int(negative))
+            self.applied.update(zip(reviews.loc[new, 'REVIEW_ID'].values[order], days.tolist()))
+            return int(new.sum())
+
+    def check(self):
+        # Windows end at the newest review seen, so a stale extract still has full windows
+        with self._lock:
+            if not self.windows:
+                return None, pd.DataFrame(), pd.DataFrame()
+            as_of = self.as_of.normalize()
+            as_of_day = int(np.datetime64(as_of, 'D').astype(int))
+            # Reviews that left the long window can no longer be applied again, so their ids are dropped
+            self.applied = {review_id: day for review_id, day in self.applied.items() if day > as_of_day - LONG_DAYS}
+            stats, found = [], []
+            for place_id, (short, long) in self.windows.items():
+                short.evict(as_of_day)
+                long.evict(as_of_day)
+                n_s, sum_s, _, neg_s = short.totals
+                n_l, sum_l, _, neg_l = long.totals
+                stats.append({
+                    'PLACE_ID': place_id,
+                    'MEAN_RATING_7D': sum_s / n_s if n_s else None,
+                    'MEAN_RATING_30D': sum_l / n_l if n_l else None,
+                    'NEGATIVE_SHARE_7D': neg_s / n_s if n_s else None,
+                    'NEGATIVE_SHARE_30D': neg_l / n_l if n_l else None,
+                    'REVIEWS_PER_DAY_7D': n_s / SHORT_DAYS,
+                    'REVIEWS_PER_DAY_30D': n_l / LONG_DAYS,
+                })
+                for alert_type, current, baseline, z in _evaluate(short.totals, long.totals):
+                    found.append({
+                        'ALERT_ID': f'{place_id}-{alert_type}-{as_of.date()}',
+                        'PLACE_ID': place_id,
+                        'ALERT_TYPE': alert_type,
+                        'CURRENT_VALUE': round(current, 3),
+                        'BASELINE_VALUE': round(baseline, 3),
+                        'Z_SCORE': round(z, 2),
+                        'REVIEWS_7D': n_s,
+                        'DETECTED_AT': str(as_of.date()),
+                    })
+        return as_of, pd.DataFrame(stats), pd.DataFrame(found, columns=[
+            'ALERT_ID', 'PLACE_ID', 'ALERT_TYPE', 'CURRENT_VALUE', 'BASELINE_VALUE', 'Z_SCORE', 'REVIEWS_7D', 'DETECTED_AT'])
+
+
+@st.cache_resource
+def get_monitor(source):
+    # One monitor per data source, fed every review of the brand
+    return AlertMonitor()
+
+
+@timed('tab.alerts')
+def alerts(reviews, locations, source, version=None):
+    monitor = get_monitor(source)
+    monitor.update(reviews, version)
+    as_of, stats, found = monitor.check()
+    if as_of is None:
+        st.info('No reviews in the last 30 days to monitor.', icon=':material/info:')
+        return
+
+    places = locations[['PLACE_ID', 'ADDRESS', 'CITY', 'STATE']].drop_duplicates('PLACE_ID')
+    found = found.merge(places, on='PLACE_ID', how='inner').sort_values('Z_SCORE', key=abs, ascending=False)
+    stats = stats.merge(places, on='PLACE_ID', how='inner')
+
+    st.markdown("##### Alerts")
+    st.caption(f"_Last {SHORT_DAYS} days compared with the {BASELINE_DAYS} days before, as of {as_of.date()}._")
+    if found.empty:
+        st.info('No significant drops for the selected locations.', icon=':material/info:')
+    else:
+        st.dataframe(
+            found,
+            column_order=('ALERT_TYPE', 'ADDRESS', 'CITY', 'STATE', 'CURRENT_VALUE', 'BASELINE_VALUE', 'Z_SCORE', 'REVIEWS_7D'),
+            column_config={
+                'ALERT_TYPE': 'Alert',
+                'ADDRESS': st.column_config.Column('Location', width='medium'),
+                'CITY': 'City',
+                'STATE': 'State',
+                'CURRENT_VALUE': st.column_config.NumberColumn('Last 7 days', format='%.2f'),
+                'BASELINE_VALUE': st.column_config.NumberColumn('Baseline', format='%.2f'),
+                'Z_SCORE': st.column_config.NumberColumn('z', format='%.1f', help='Standard errors away from the baseline'),
+                'REVIEWS_7D': '# of Reviews',
+            },
+            hide_index=True,
+            use_container_width=True)
+        if st.button('Save alerts', icon=':material/save:'):
+            columns = ['ALERT_ID', 'PLACE_ID', 'ALERT_TYPE', 'CURRENT_VALUE', 'BASELINE_VALUE', 'Z_SCORE', 'REVIEWS_7D', 'DETECTED_AT']
+            if write_table(st.secrets.get('alerts_table', 'in.c-whataburger-demo.ALERTS'), found[columns], is_incremental=True):
+                st.success('Alerts saved successfully!')
+
+    st.markdown("##### Rolling Statistics")
+    st.dataframe(
+        stats.sort_values('MEAN_RATING_7D'),
+        column_order=('ADDRESS', 'CITY', 'MEAN_RATING_7D', 'MEAN_RATING_30D', 'NEGATIVE_SHARE_7D', 'NEGATIVE_SHARE_30D',
+                      'REVIEWS_PER_DAY_7D', 'REVIEWS_PER_DAY_30D'),
+        column_config={
+            'ADDRESS': st.column_config.Column('Location', width='medium'),
+            'CITY': 'City',
+            'MEAN_RATING_7D': st.column_config.NumberColumn('Avg Rating 7d', format='⭐️ %.2f'),
+            'MEAN_RATING_30D': st.column_config.NumberColumn('Avg Rating 30d', format='⭐️ %.2f'),
+            'NEGATIVE_SHARE_7D': st.column_config.NumberColumn('Negative 7d', format='percent'),
+            'NEGATIVE_SHARE_30D': st.column_config.NumberColumn('Negative 30d', format='percent'),
+            'REVIEWS_PER_DAY_7D': st.column_config.NumberColumn('Reviews/day 7d', format='%.2f'),
+            'REVIEWS_PER_DAY_30D': st.column_config.NumberColumn('Reviews/day 30d', format='%.2f'),
+        },
+        hide_index=True,
+        use_container_width=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check every location for significant rating, sentiment or review rate drops.')
+    parser.add_argument('reviews_csv')
+    parser.add_argument('--table', help='also append the alerts to this Storage table')
+    args = parser.parse_args()
+
+    monitor = AlertMonitor()
+    applied = monitor.update(pd.read_csv(args.reviews_csv))
+    as_of, stats, found = monitor.check()
+    print(f'Applied {applied:,} reviews across {len(stats):,} locations, {len(found):,} alerts as of {as_of.date() if as_of else "-"}')
+    if not found.empty:
+        print(found.to_string(index=False))
+        if args.table:
+            write_table(args.table, found, is_incremental=True)
+
+
+if __name__ == '__main__':
+    main()
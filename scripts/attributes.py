@@ -0,0 +1,116 @@
+# Usage: python -m scripts.attributes STORE_DIR RELATIONS_CSV [--id-column SENTENCE_ID] [--rules RULES_JSON]
+import argparse
+import hashlib
+import json
+import os
+
+import pandas as pd
+import streamlit as st
+
+from pathlib import Path
+
+DEFAULT_RULES = {
+    'aliases': {'burgers': 'burger'},
+    # Matched exactly, as the dashboard always has
+    'stopwords': ['i', 'you', 'she', 'he', 'it', 'we', 'they', 'I', 'You', 'She', 'He', 'It', 'We', 'They', 'whataburger', 'Whataburger'],
+    'min_count': 3,
+}
+RAW_COUNTS = 'raw_counts.parquet'
+FINISHED_COUNTS = 'attribute_counts.parquet'
+SEEN_IDS = 'seen_ids.parquet'
+STATE = 'state.json'
+
+
+def get_rules(overrides=None):
+    rules = {**DEFAULT_RULES, **(overrides or {})}
+    return {'aliases': dict(rules['aliases']), 'stopwords': list(rules['stopwords']), 'min_count': int(rules['min_count'])}
+
+
+def _rules_key(rules):
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def finish(counts, rules):
+    # Normalized (entity, attribute) counts above the threshold, as the AI Analysis tab shows them
+    entity = counts['entity'].replace(rules['aliases'])
+    keep = ~entity.isin(rules['stopwords'])
+    counts = counts.assign(entity=entity)[keep]
+    counts = counts.groupby(['entity', 'attribute'])['count'].sum().reset_index()
+    return counts[counts['count'] >= rules['min_count']].reset_index(drop=True)
+
+
+def _write(df, path):
+    tmp = path.with_name(f'.{path.name}.tmp')
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def update(store, relations, rules=None, id_column='SENTENCE_ID'):
+    # Rows with an id not applied before are added to the raw counts; input without ids is a full snapshot that replaces them
+    store = Path(store)
+    store.mkdir(parents=True, exist_ok=True)
+    rules = get_rules(rules)
+    state_path = store / STATE
+    state = json.loads(state_path.read_text()) if state_path.exists() else {'rules': None}
+    raw_path = store / RAW_COUNTS
+    seen_path = store / SEEN_IDS
+    raw = pd.read_parquet(raw_path) if raw_path.exists() else pd.DataFrame({'entity': [], 'attribute': [], 'count': []})
+
+    snapshot = id_column not in relations.columns
+    if not snapshot:
+        # Ids are not assumed to increase, so every applied id is remembered
+        seen = pd.read_parquet(seen_path)['id'] if seen_path.exists() else pd.Series([], dtype=object, name='id')
+        relations = relations[~relations[id_column].astype(str).isin(seen)]
+        applied = len(relations)
+        if applied:
+            delta = relations.assign(count=relations['count'] if 'count' in relations.columns else 1)
+            raw = pd.concat([raw, delta[['entity', 'attribute', 'count']]])
+            seen = pd.concat([seen, relations[id_column].astype(str).drop_duplicates().rename('id')], ignore_index=True)
+    else:
+        # Cumulative exports are counted once in full, never added on top of what is stored
+        applied = len(relations)
+        raw = relations.assign(count=relations['count'] if 'count' in relations.columns else 1)[['entity', 'attribute', 'count']]
+        seen_path.unlink(missing_ok=True)
+
+    key = _rules_key(rules)
+    if applied or snapshot:
+        raw = raw.groupby(['entity', 'attribute'])['count'].sum().reset_index()
+        raw['count'] = raw['count'].astype('int64')
+        _write(raw, raw_path)
+        if applied and not snapshot:
+            _write(seen.to_frame(), seen_path)
+    if applied or snapshot or state['rules'] != key:
+        _write(finish(raw, rules), store / FINISHED_COUNTS)
+        state['rules'] = key
+    tmp = state_path.with_name(f'.{STATE}.tmp')
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, state_path)
+    return applied
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def _read_finished(path, modified_at):
+    return pd.read_parquet(path)
+
+
+def read_attribute_counts(store):
+    path = Path(store) / FINISHED_COUNTS
+    return _read_finished(str(path), path.stat().st_mtime_ns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply new entity-attribute relation rows to the persistent counts table.')
+    parser.add_argument('store_dir')
+    parser.add_argument('relations_csv', help='rows with entity, attribute and optionally count')
+    parser.add_argument('--id-column', default='SENTENCE_ID', help='id of a relation row; input without it replaces the stored counts')
+    parser.add_argument('--rules', help='JSON file overriding aliases, stopwords or min_count')
+    args = parser.parse_args()
+
+    rules = json.loads(Path(args.rules).read_text()) if args.rules else None
+    applied = update(args.store_dir, pd.read_csv(args.relations_csv), rules, args.id_column)
+    finished = pd.read_parquet(Path(args.store_dir) / FINISHED_COUNTS)
+    print(f'Applied {applied:,} new rows, {len(finished):,} entity-attribute pairs above the threshold')
+
+
+if __name__ == '__main__':
+    main()
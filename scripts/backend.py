@@ -0,0 +1,90 @@
+import importlib.util
+import os
+import pandas as pd
+import streamlit as st
+
+from pathlib import Path
+
+
+def sql_enabled():
+    # Only looks duckdb up, it is imported once the first connection is opened
+    return st.secrets.get('sql_backend') == 'duckdb' and importlib.util.find_spec('duckdb') is not None
+
+
+@st.cache_resource
+def get_connection():
+    import duckdb
+
+    connection = duckdb.connect(database=':memory:')
+    connection.execute(f"SET threads TO {int(st.secrets.get('sql_threads', os.cpu_count() or 4))}")
+    return connection
+
+
+class ReviewsQuery:
+    # Only the sidebar cascade runs against the store. fetch() still materializes the selected reviews for the tabs,
+    # so memory is bounded by the selection (the whole brand when nothing is filtered), not by the size of the store
+    def __init__(self, root, brand, place_ids, conditions=()):
+        self.root = Path(root)
+        self.brand = brand
+        self.place_ids = [str(place_id) for place_id in place_ids]
+        self.conditions = list(conditions)
+
+    def where(self, condition, *params):
+        return ReviewsQuery(self.root, self.brand, self.place_ids, self.conditions + [(condition, list(params))])
+
+    def _execute(self, select):
+        source = (self.root / 'reviews' / '**' / '*.parquet').as_posix()
+        # BRAND (and REVIEW_MONTH) are hive partition keys, so these predicates prune whole directories
+        conditions = [('BRAND = ?', [self.brand]), ('PLACE_ID IN (SELECT UNNEST(?::VARCHAR[]))', [self.place_ids])] + self.conditions
+        sql = (f"SELECT {select} FROM read_parquet('{source}', hive_partitioning = true) "
+               f"WHERE {' AND '.join(condition for condition, _ in conditions)}")
+        params = [param for _, condition_params in conditions for param in condition_params]
+        cursor = get_connection().cursor()
+        try:
+            return cursor.execute(sql, params)
+        except Exception:
+            cursor.close()
+            raise
+
+    def unique(self, column):
+        return [row[0] for row in self._execute(f'DISTINCT {column}').fetchall()]
+
+    def date_bounds(self):
+        return self._execute('MIN(CAST(REVIEW_DATE AS TIMESTAMP)), MAX(CAST(REVIEW_DATE AS TIMESTAMP))').fetchone()
+
+    def between(self, start, end):
+        # No reviews means no date bounds, which matches nothing like the pandas path
+        if pd.isna(start) or pd.isna(end):
+            return self.where('FALSE')
+        query = self.where('CAST(REVIEW_DATE AS TIMESTAMP) BETWEEN ? AND ?', start.to_pydatetime(), end.to_pydatetime())
+        from scripts.storage import partitioned_by_month
+
+        if partitioned_by_month(str(self.root)):
+            query = query.where('REVIEW_MONTH BETWEEN ? AND ?', start.strftime('%Y-%m'), end.strftime('%Y-%m'))
+        return query
+
+    def fetch(self):
+        from scripts.storage import partitioned_by_month
+
+        partition_columns = ['BRAND'] + (['REVIEW_MONTH'] if partitioned_by_month(str(self.root)) else [])
+        return self._execute(f"* EXCLUDE ({', '.join(partition_columns)})").df()
+
+
+def unique_values(reviews, column):
+    if isinstance(reviews, ReviewsQuery):
+        return reviews.unique(column)
+    return reviews[column].unique().tolist()
+
+
+def keep_values(reviews, column, values):
+    if isinstance(reviews, ReviewsQuery):
+        if len(values) == 0:
+            return reviews.where('FALSE')
+        return reviews.where(f'{column} IN (SELECT UNNEST(?))', list(values))
+    return reviews[reviews[column].isin(values)]
+
+
+def date_bounds(reviews):
+    if isinstance(reviews, ReviewsQuery):
+        return tuple(pd.NaT if value is None else pd.to_datetime(value) for value in reviews.date_bounds())
+    return pd.to_datetime(reviews['REVIEW_DATE'].min()), pd.to_datetime(reviews['REVIEW_DATE'].max())
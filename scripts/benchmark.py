@@ -0,0 +1,205 @@
+# Usage: python -m scripts.benchmark [--scales small medium] [--tolerance 0.5] [--baseline PATH] [--update-baseline]
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import uuid
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.synthetic import SCALES, write_dataset
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / 'streamlit_app.py'
+BASELINE_PATH = ROOT / 'benchmarks' / 'baselines.json'
+TABS = ['About', 'Locations', 'Overview', 'AI Analysis', 'Support', 'Assistant', 'Alerts']
+
+
+class _StandInKeboola:
+    # Table names in the benchmark secrets are local CSV paths
+    def __init__(self, url, token):
+        pass
+
+    def read_table(self, table_name):
+        return pd.read_csv(table_name)
+
+
+class _StandInStorageClient:
+    def __init__(self, *args, **kwargs):
+        self.tables = types.SimpleNamespace(load_raw=lambda **kwargs: {'id': 'standin-job'})
+
+
+class _StandInFiles:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def upload_file(self, *args, **kwargs):
+        return 'standin-file'
+
+
+class _StandInOpenAI:
+    def __init__(self):
+        ns = types.SimpleNamespace
+        self.beta = ns(threads=ns(
+            create=lambda **kwargs: ns(id=f'thread_{uuid.uuid4().hex}'),
+            messages=ns(create=lambda *args, **kwargs: ns(id=f'msg_{uuid.uuid4().hex}')),
+            runs=ns(stream=self._stream),
+        ))
+        self.chat = ns(completions=ns(create=lambda **kwargs: ns(choices=[ns(message=ns(content='Thank you for your feedback!'))])))
+        self.files = ns(
+            create=lambda **kwargs: ns(id=f'file_{uuid.uuid4().hex}'),
+            delete=lambda file_id: None,
+            list=lambda **kwargs: [],
+        )
+
+    def _stream(self, **kwargs):
+        raise RuntimeError('The benchmark does not run Assistant prompts')
+
+
+def install_standins():
+    keboola_streamlit = types.ModuleType('keboola_streamlit')
+    keboola_streamlit.KeboolaStreamlit = _StandInKeboola
+    kbcstorage = types.ModuleType('kbcstorage')
+    kbcstorage_client = types.ModuleType('kbcstorage.client')
+    kbcstorage_client.Client = _StandInStorageClient
+    kbcstorage_client.Files = _StandInFiles
+    kbcstorage.client = kbcstorage_client
+    sys.modules.update({'keboola_streamlit': keboola_streamlit, 'kbcstorage': kbcstorage, 'kbcstorage.client': kbcstorage_client})
+
+    import scripts.openai
+    standin = _StandInOpenAI()
+    scripts.openai.get_client = lambda: standin
+
+
+def make_secrets(paths):
+    return {
+        'ASSISTANT_ID': 'asst_benchmark', 'FILE_ID': 'file_benchmark', 'LOGO_URL': '', 'MINI_LOGO_URL': '🤖',
+        'kbc_url': 'http://localhost', 'KEBOOLA_TOKEN': 'benchmark', 'OPENAI_API_KEY': 'benchmark',
+        'locations_path': str(paths['locations']), 'reviews_path': str(paths['reviews']),
+        'sentences_path': str(paths['sentences']), 'entities_path': str(paths['entities']),
+        'attributes_path': str(paths['attributes']), 'bot_path': str(paths['bot']),
+    }
+
+
+def run_app(at, tab):
+    at.session_state['menu_id'] = tab
+    started_at = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started_at
+    if at.exception:
+        raise RuntimeError(f'{tab} raised: {at.exception[0].message}')
+    return elapsed
+
+
+def calibrate(runs=7):
+    # A fixed pandas workload timed on this machine; latencies are stored in multiples of it so baselines travel between machines
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({'key': rng.integers(0, 1000, 500_000), 'value': rng.random(500_000)})
+    timings = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        frame.groupby('key')['value'].agg(['mean', 'count'])
+        frame.sort_values('value')
+        timings.append(time.perf_counter() - started_at)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+def benchmark_scale(scale, tabs, runs):
+    from streamlit.testing.v1 import AppTest
+
+    size = SCALES[scale]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_dataset(tmp, size['locations'], size['reviews_per_location'])
+        at = AppTest.from_file(str(APP_PATH), default_timeout=600)
+        at.secrets.update(make_secrets(paths))
+
+        results = {'cold_start_ms': round(run_app(at, tabs[0]) * 1000, 1), 'calibration_ms': round(calibrate(), 1), 'tabs': {}}
+        for tab in tabs:
+            run_app(at, tab)  # first visit pays for lazy imports and cache fills
+            latencies = sorted(run_app(at, tab) for _ in range(runs))
+
+            # Memory is traced in a separate rerun so tracing overhead does not skew latency
+            tracemalloc.start()
+            run_app(at, tab)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            rerun_ms = latencies[len(latencies) // 2] * 1000
+            results['tabs'][tab] = {
+                'rerun_ms': round(rerun_ms, 1),
+                'rerun_units': round(rerun_ms / results['calibration_ms'], 2),
+                'peak_mb': round(peak / 1024 / 1024, 1),
+            }
+    return results
+
+
+# Absolute milliseconds depend on the machine, so only the calibrated latency and memory are compared
+COMPARED_METRICS = ('rerun_units', 'peak_mb')
+
+
+def compare(results, baselines, tolerance, min_delta_ms=0):
+    regressions = []
+    for scale, scale_results in results.items():
+        baseline = baselines.get(scale)
+        if baseline is None:
+            continue
+        # Short reruns are noisy, so a slowdown also has to exceed a fixed amount of time
+        min_delta = {'rerun_units': min_delta_ms / scale_results['calibration_ms'], 'peak_mb': 0}
+        for tab, metrics in scale_results['tabs'].items():
+            for metric in COMPARED_METRICS:
+                value = metrics.get(metric)
+                expected = baseline.get('tabs', {}).get(tab, {}).get(metric)
+                if value is not None and expected and value > expected * (1 + tolerance) and value - expected > min_delta[metric]:
+                    regressions.append(f'{scale}/{tab}/{metric}: {value} vs baseline {expected}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-tab rerun latency and peak memory on synthetic data.')
+    parser.add_argument('--scales', nargs='+', choices=SCALES, default=['small', 'medium'])
+    parser.add_argument('--tabs', nargs='+', choices=TABS, default=TABS)
+    parser.add_argument('--runs', type=int, default=5, help='reruns per tab, the median is reported')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown before a result counts as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=100, help='slowdowns smaller than this are treated as noise')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='baseline file, e.g. one generated per machine')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the new baseline')
+    args = parser.parse_args()
+
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    install_standins()
+
+    results = {}
+    for scale in args.scales:
+        results[scale] = benchmark_scale(scale, args.tabs, args.runs)
+        print(f"\n{scale} ({SCALES[scale]['locations']} locations x {SCALES[scale]['reviews_per_location']} reviews), "
+              f"cold start {results[scale]['cold_start_ms']} ms, calibration {results[scale]['calibration_ms']} ms")
+        print(f"{'Tab':<12} {'rerun ms':>10} {'units':>7} {'peak MB':>9}")
+        for tab, metrics in results[scale]['tabs'].items():
+            print(f"{tab:<12} {metrics['rerun_ms']:>10} {metrics['rerun_units']:>7} {metrics['peak_mb']:>9}")
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.update_baseline:
+        baselines.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2) + '\n')
+        print(f'\nBaseline written to {args.baseline}')
+        return
+
+    regressions = compare(results, baselines, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print('\nRegressions:')
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+    print('\nNo regressions against the stored baseline.')
+
+
+if __name__ == '__main__':
+    main()
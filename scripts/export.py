@@ -0,0 +1,112 @@
+import io
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+CHUNK_ROWS = 50_000
+SENTENCE_LIST_COLUMNS = ['CATEGORY', 'CATEGORY_GROUP', 'TOPIC']
+LIST_COLUMNS = SENTENCE_LIST_COLUMNS + ['ENTITY']
+
+
+def _chunk_slices(review_ids, chunk_of, chunks):
+    # Row positions grouped by the export chunk their review falls into, found with one sort
+    codes = review_ids.map(chunk_of).fillna(chunks).to_numpy(dtype=int)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(chunks + 1))
+    return order, bounds
+
+
+def _lists(rows, column):
+    return rows[['REVIEW_ID', column]].dropna().drop_duplicates().groupby('REVIEW_ID')[column].agg(list)
+
+
+def iter_chunks(reviews, sentences=None, entities=None, chunk_rows=CHUNK_ROWS):
+    # Yields the reviews chunk by chunk with the list columns joined for that chunk only
+    reviews = reviews.drop(columns=LIST_COLUMNS, errors='ignore')
+    chunks = max(1, -(-len(reviews) // chunk_rows))
+    chunk_of = pd.Series(np.arange(len(reviews)) // chunk_rows, index=reviews['REVIEW_ID'].to_numpy())
+    chunk_of = chunk_of[~chunk_of.index.duplicated()]
+    # Callers may pass the rows of every review, only those of the exported ones are sorted into chunks
+    if sentences is not None:
+        sentences = sentences[sentences['REVIEW_ID'].isin(chunk_of.index)]
+        sentence_order, sentence_bounds = _chunk_slices(sentences['REVIEW_ID'], chunk_of, chunks)
+    if entities is not None:
+        entities = entities[entities['REVIEW_ID'].isin(chunk_of.index)]
+        entity_order, entity_bounds = _chunk_slices(entities['REVIEW_ID'], chunk_of, chunks)
+
+    for i in range(chunks):
+        chunk = reviews.iloc[i * chunk_rows:(i + 1) * chunk_rows].copy()
+        if sentences is not None:
+            chunk_sentences = sentences.iloc[sentence_order[sentence_bounds[i]:sentence_bounds[i + 1]]]
+            for column in SENTENCE_LIST_COLUMNS:
+                chunk[column] = chunk['REVIEW_ID'].map(_lists(chunk_sentences, column)).astype(object)
+        if entities is not None:
+            chunk_entities = entities.iloc[entity_order[entity_bounds[i]:entity_bounds[i + 1]]]
+            chunk['ENTITY'] = chunk['REVIEW_ID'].map(chunk_entities.groupby('REVIEW_ID')['ENTITY'].agg(list)).astype(object)
+        yield chunk
+
+
+def _parquet_schema(chunk):
+    fields = []
+    for field in pa.Schema.from_pandas(chunk, preserve_index=False):
+        if field.name in LIST_COLUMNS:
+            field = field.with_type(pa.list_(pa.string()))
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def write_export(chunks, f, file_format):
+    # One CSV block or Parquet row group per chunk into the open binary file f, so memory stays at about one chunk
+    if file_format == 'CSV':
+        text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+        try:
+            for i, chunk in enumerate(chunks):
+                for column in LIST_COLUMNS:
+                    if column in chunk:
+                        chunk[column] = chunk[column].map(lambda values: '; '.join(map(str, values)) if isinstance(values, list) else '')
+                chunk.to_csv(text, index=False, header=i == 0)
+        finally:
+            # Leaves f open for the caller
+            text.flush()
+            text.detach()
+        return
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                writer = pq.ParquetWriter(f, _parquet_schema(chunk), compression='zstd')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_button(reviews, file_name, sentences=None, entities=None, key='export'):
+    with st.popover('⬇️ Export'):
+        file_format = st.radio('Format', ['CSV', 'Parquet'], horizontal=True, key=f'{key}_format')
+        st.caption(f'{len(reviews):,} reviews')
+        extension = file_format.lower()
+
+        # Only runs when the download is clicked, on a thread separate from the rerun. The unnamed temp file is
+        # handed to Streamlit still open rather than read back here, and is deleted once Streamlit has served it
+        def build():
+            f = tempfile.TemporaryFile(buffering=0)
+            buffered = io.BufferedWriter(f)
+            write_export(iter_chunks(reviews, sentences, entities), buffered, file_format)
+            buffered.flush()
+            buffered.detach()
+            return f
+
+        st.download_button(
+            f'Download {file_format}',
+            data=build,
+            file_name=f'{file_name}.{extension}',
+            mime='text/csv' if file_format == 'CSV' else 'application/vnd.apache.parquet',
+            key=f'{key}_download',
+            use_container_width=True)
@@ -0,0 +1,80 @@
+import numpy as np
+import streamlit as st
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = 69.05
+
+
+def haversine_miles(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+class GridIndex:
+    # Points bucketed into cell_deg x cell_deg cells, each cell a contiguous slice of the sorted arrays
+    def __init__(self, ids, lats, lons, cell_deg=0.5):
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        self.cell_deg = cell_deg
+        rows = np.floor(lats[valid] / cell_deg).astype(int)
+        cols = np.floor(lons[valid] / cell_deg).astype(int)
+        order = np.lexsort((cols, rows))
+        self.ids = np.asarray(ids)[valid][order]
+        self.lats = lats[valid][order]
+        self.lons = lons[valid][order]
+        keys = np.stack([rows[order], cols[order]], axis=1)
+        starts = np.flatnonzero(np.r_[True, (np.diff(keys, axis=0) != 0).any(axis=1)]) if len(keys) else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(keys)]
+        self.cells = {(int(keys[s, 0]), int(keys[s, 1])): (s, e) for s, e in zip(starts, ends)}
+        self.row_span = (rows.min(), rows.max()) if len(rows) else (0, -1)
+        self.col_span = (cols.min(), cols.max()) if len(cols) else (0, -1)
+
+    def _candidates(self, row_range, col_range):
+        slices = [self.cells[(r, c)] for r in row_range for c in col_range if (r, c) in self.cells]
+        if not slices:
+            return np.array([], dtype=int)
+        return np.concatenate([np.arange(s, e) for s, e in slices])
+
+    def within(self, lat, lon, miles):
+        # Returns (ids, distances) of every point within `miles`, nearest first
+        lat_pad = miles / MILES_PER_DEGREE
+        lon_pad = miles / (MILES_PER_DEGREE * max(np.cos(np.radians(min(abs(lat) + lat_pad, 89.9))), 1e-6))
+        rows = range(int(np.floor((lat - lat_pad) / self.cell_deg)), int(np.floor((lat + lat_pad) / self.cell_deg)) + 1)
+        cols = range(int(np.floor((lon - lon_pad) / self.cell_deg)), int(np.floor((lon + lon_pad) / self.cell_deg)) + 1)
+        if len(rows) * len(cols) > len(self.cells):
+            candidates = np.arange(len(self.ids))
+        else:
+            candidates = self._candidates(rows, cols)
+        distances = haversine_miles(lat, lon, self.lats[candidates], self.lons[candidates])
+        keep = distances <= miles
+        order = np.argsort(distances[keep], kind='stable')
+        return self.ids[candidates[keep]][order], distances[keep][order]
+
+    def nearest(self, lat, lon, k):
+        # Grows a ring of cells until the k-th distance is inside the searched square
+        row, col = int(np.floor(lat / self.cell_deg)), int(np.floor(lon / self.cell_deg))
+        max_ring = max(abs(row - self.row_span[0]), abs(row - self.row_span[1]), abs(col - self.col_span[0]), abs(col - self.col_span[1]), 0)
+        k = min(k, len(self.ids))
+        if k == 0:
+            return self.ids[:0], self.lats[:0]
+        for ring in range(max_ring + 1):
+            candidates = self._candidates(range(row - ring, row + ring + 1), range(col - ring, col + ring + 1))
+            if len(candidates) < k:
+                continue
+            distances = haversine_miles(lat, lon, self.lats[candidates], self.lons[candidates])
+            order = np.argsort(distances, kind='stable')[:k]
+            # Anything outside the square is at least `ring` cells away in latitude or (shrunk) longitude
+            searched = ring * self.cell_deg * MILES_PER_DEGREE * np.cos(np.radians(min(abs(lat) + (ring + 1) * self.cell_deg, 89.9)))
+            if ring == max_ring or distances[order[-1]] <= searched:
+                return self.ids[candidates[order]], distances[order]
+        distances = haversine_miles(lat, lon, self.lats, self.lons)
+        order = np.argsort(distances, kind='stable')[:k]
+        return self.ids[order], distances[order]
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_spatial_index(locations):
+    # Keyed by the content of the frame, so it is rebuilt only when the locations change
+    return GridIndex(locations['PLACE_ID'].to_numpy(), locations['LATITUDE'].to_numpy(), locations['LONGITUDE'].to_numpy())
@@ -0,0 +1,41 @@
+import threading
+
+from collections import OrderedDict
+
+import streamlit as st
+
+
+class ImageCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_id):
+        with self._lock:
+            data = self._items.get(file_id)
+            if data is not None:
+                self._items.move_to_end(file_id)
+            return data
+
+    def put(self, file_id, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if file_id in self._items:
+                self.size -= len(self._items.pop(file_id))
+            self._items[file_id] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'images': len(self._items), 'bytes': self.size, 'max_bytes': self.max_bytes}
+
+
+@st.cache_resource
+def get_image_cache():
+    return ImageCache(max_bytes=st.secrets.get('IMAGE_CACHE_MB', 64) * 1024 * 1024)
@@ -0,0 +1,75 @@
+# Usage: python -m scripts.import_profile [--top 10]
+import argparse
+import re
+import subprocess
+import sys
+
+from pathlib import Path
+
+TAB_MODULES = {
+    'Startup': ['streamlit', 'pandas', 'streamlit_option_menu', 'scripts.sapi', 'scripts.attributes', 'scripts.geo',
+                'scripts.session', 'scripts.timing', 'scripts.backend', 'scripts.summary'],
+    # Only imported when the matching data source is configured
+    'Parquet store': ['scripts.storage'],
+    'Shared data': ['scripts.shared_data'],
+    'About': ['scripts.about'],
+    'Locations': ['scripts.viz', 'scripts.locations'],
+    'Overview': ['scripts.viz', 'scripts.overview'],
+    'AI Analysis': ['scripts.viz', 'scripts.ai_analysis'],
+    'Support': ['scripts.support'],
+    'Assistant': ['scripts.openai'],
+}
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def profile(modules, baseline=()):
+    # Modules loaded before the tab (e.g. at startup) are imported first so only the tab's own cost is measured
+    code = ';'.join(f'import {module}' for module in baseline)
+    marker = f'import sys; sys.stderr.write("--- tab ---\\n")'
+    code = ';'.join(filter(None, [code, marker] + [f'import {module}' for module in modules]))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    stderr = result.stderr.split('--- tab ---\n', 1)[-1]
+
+    total = 0
+    heaviest = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        cumulative = int(match.group(2))
+        depth = len(match.group(3)) // 2
+        if depth == 0:
+            total += cumulative
+        heaviest.append((cumulative, match.group(4)))
+    heaviest.sort(reverse=True)
+    return total / 1000, heaviest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report import time per dashboard tab.')
+    parser.add_argument('--top', type=int, default=5, help='number of heaviest modules to list per tab')
+    args = parser.parse_args()
+
+    startup = TAB_MODULES['Startup']
+    print(f"{'Tab':<13} {'ms':>9}  Heaviest imports")
+    for tab, modules in TAB_MODULES.items():
+        baseline = () if tab == 'Startup' else startup
+        try:
+            total, heaviest = profile(modules, baseline)
+        except RuntimeError as e:
+            print(f'{tab:<13} {"failed":>9}  {e}')
+            continue
+        top = ', '.join(f'{name} ({cumulative / 1000:.0f} ms)' for cumulative, name in heaviest[:args.top])
+        print(f'{tab:<13} {total:>9.1f}  {top}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+import re
+import pandas as pd
+
+SENTIMENTS = {'positive': 'Positive', 'negative': 'Negative', 'mixed': 'Mixed'}
+DETAILED_RATINGS = {'food': 'REVIEW_DETAILED_FOOD', 'service': 'REVIEW_DETAILED_SERVICE', 'atmosphere': 'REVIEW_DETAILED_ATMOSPHERE'}
+DIMENSIONS = {
+    'state': 'STATE', 'states': 'STATE',
+    'city': 'CITY', 'cities': 'CITY',
+    'store': 'STORE', 'stores': 'STORE', 'location': 'STORE', 'locations': 'STORE',
+    'restaurant': 'STORE', 'restaurants': 'STORE', 'place': 'STORE', 'places': 'STORE',
+    'sentiment': 'OVERALL_SENTIMENT', 'sentiments': 'OVERALL_SENTIMENT',
+    'month': 'MONTH', 'months': 'MONTH', 'monthly': 'MONTH',
+    'week': 'WEEK', 'weeks': 'WEEK', 'weekly': 'WEEK',
+    'day': 'DAY', 'days': 'DAY', 'daily': 'DAY',
+}
+DIMENSION_LABELS = {'STATE': ('state', 'states'), 'CITY': ('city', 'cities'), 'STORE': ('location', 'locations'),
+                    'OVERALL_SENTIMENT': ('sentiment', 'sentiments'), 'MONTH': ('month', 'months'), 'WEEK': ('week', 'weeks'), 'DAY': ('day', 'days')}
+PERIODS = {'MONTH': 'M', 'WEEK': 'W', 'DAY': 'D'}
+
+MEAN_WORDS = {'average', 'avg', 'mean', 'rating', 'ratings', 'score', 'scores', 'rated'}
+COUNT_WORDS = {'many', 'number', 'count', 'counts', 'total', 'volume'}
+SHARE_WORDS = {'share', 'percentage', 'percent', 'proportion', 'ratio', 'fraction'}
+DESCENDING_WORDS = {'most', 'highest', 'best', 'top', 'max', 'maximum', 'largest', 'biggest'}
+ASCENDING_WORDS = {'least', 'lowest', 'worst', 'fewest', 'bottom', 'min', 'minimum', 'smallest'}
+FILLER_WORDS = {
+    'what', 'which', 'who', 'how', 'is', 'are', 'was', 'were', 'the', 'a', 'an', 'of', 'for', 'in', 'at', 'on',
+    'per', 'by', 'each', 'every', 'with', 'has', 'have', 'had', 'got', 'did', 'does', 'do', 'me', 'show', 'give',
+    'list', 'tell', 'get', 'and', 'all', 'overall', 'our', 'my', 'we', 'there', 'it', 'its', 'to', 'from',
+    'review', 'reviews', 'customer', 'customers', 'received', 'receive', 'gets', 'been', 'please', 'across', 'over',
+}
+ROW_LIMIT = 50
+MIN_REVIEWS_FOR_RANKING = 5
+
+WINDOW_PATTERN = re.compile(r'\b(?:in the |over the |during the )?(last|past) (?:(\d+) )?(day|week|month|year)s?\b')
+TOP_PATTERN = re.compile(r'\b(top|bottom) (\d+)\b')
+
+
+def _time_window(question):
+    match = WINDOW_PATTERN.search(question)
+    if match is None:
+        return question, None
+    amount = int(match.group(2) or 1)
+    unit = match.group(3)
+    end = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    offset = {'day': pd.DateOffset(days=amount), 'week': pd.DateOffset(weeks=amount),
+              'month': pd.DateOffset(months=amount), 'year': pd.DateOffset(years=amount)}[unit]
+    label = f"the {match.group(1)} {amount} {unit}s" if amount > 1 else f"the {match.group(1)} {unit}"
+    return question[:match.start()] + ' ' + question[match.end():], (end - offset, end, label)
+
+
+def _value_filters(question, original, data):
+    filters = {}
+    for column in ('STATE', 'CITY'):
+        if column not in data.columns:
+            continue
+        for value in data[column].dropna().unique():
+            value = str(value)
+            # Short codes such as state abbreviations must be written in upper case to count
+            if len(value) <= 3:
+                found = re.search(rf'\b{re.escape(value)}\b', original) is not None
+            else:
+                found = re.search(rf'\b{re.escape(value.lower())}\b', question) is not None
+            if found:
+                filters.setdefault(column, []).append(value)
+                question = re.sub(rf'\b{re.escape(value.lower())}\b', ' ', question)
+    return question, filters
+
+
+def parse_question(question, data):
+    original = question
+    question = question.lower().replace('%', ' percent ')
+    question, window = _time_window(question)
+
+    top_n = None
+    match = TOP_PATTERN.search(question)
+    if match:
+        top_n = int(match.group(2))
+        question = question[:match.start()] + ' ' + match.group(1) + ' ' + question[match.end():]
+
+    question, filters = _value_filters(question, original, data)
+    words = re.findall(r'[a-z]+', question)
+    vocabulary = (set(SENTIMENTS) | set(DETAILED_RATINGS) | set(DIMENSIONS) | MEAN_WORDS | COUNT_WORDS
+                  | SHARE_WORDS | DESCENDING_WORDS | ASCENDING_WORDS | FILLER_WORDS)
+    # Anything we do not understand goes to the assistant rather than being silently ignored
+    if not words or any(word not in vocabulary for word in words):
+        return None
+
+    sentiment = next((SENTIMENTS[w] for w in words if w in SENTIMENTS), None)
+    detailed = next((DETAILED_RATINGS[w] for w in words if w in DETAILED_RATINGS), None)
+    dimension = next((DIMENSIONS[w] for w in words if w in DIMENSIONS), None)
+    if dimension == 'OVERALL_SENTIMENT' and sentiment is not None:
+        dimension = None
+
+    counts = any(w in COUNT_WORDS for w in words)
+    averages = detailed is not None or any(w in MEAN_WORDS for w in words)
+    if sentiment is not None and any(w in SHARE_WORDS for w in words):
+        metric = 'share'
+    elif counts and any(w in {'average', 'avg', 'mean'} for w in words):
+        # Asks for both a count and an average, the assistant can sort that out
+        return None
+    elif counts or (sentiment is not None and not averages):
+        metric = 'count'
+    elif detailed is not None:
+        metric = 'detailed'
+    elif any(w in MEAN_WORDS for w in words):
+        metric = 'mean'
+    elif dimension is not None and any(w in DESCENDING_WORDS | ASCENDING_WORDS for w in words) and 'reviews' in words:
+        metric = 'count'
+    else:
+        return None
+
+    if any(w in ASCENDING_WORDS for w in words):
+        order = 'asc'
+    elif any(w in DESCENDING_WORDS for w in words):
+        order = 'desc'
+    else:
+        order = None
+
+    return {
+        'metric': metric,
+        'sentiment': sentiment,
+        'column': detailed if metric == 'detailed' else 'RATING',
+        'dimension': dimension,
+        'order': order,
+        'top_n': top_n or (1 if order and 'top' not in words and 'bottom' not in words else None),
+        'window': window,
+        'filters': filters,
+    }
+
+
+def _store_column(data):
+    return 'ADDRESS' if 'ADDRESS' in data.columns else 'PLACE_ID'
+
+
+def run_query(intent, data):
+    if intent['window'] is not None:
+        start, end, _ = intent['window']
+        dates = pd.to_datetime(data['REVIEW_DATE'])
+        data = data[(dates >= start) & (dates < end)]
+    for column, values in intent['filters'].items():
+        data = data[data[column].isin(values)]
+    # Averages of a sentiment are taken over the reviews with that sentiment only
+    if intent['sentiment'] and intent['metric'] in ('mean', 'detailed'):
+        data = data[data['OVERALL_SENTIMENT'].eq(intent['sentiment'])]
+
+    dimension = intent['dimension']
+    if dimension in PERIODS:
+        keys = pd.to_datetime(data['REVIEW_DATE']).dt.to_period(PERIODS[dimension]).astype(str).rename(dimension)
+    elif dimension == 'STORE':
+        keys = data[_store_column(data)].rename('STORE')
+    elif dimension is not None:
+        keys = data[dimension]
+    else:
+        keys = None
+
+    metric = intent['metric']
+    if metric == 'share':
+        values = data['OVERALL_SENTIMENT'].eq(intent['sentiment'])
+    elif metric == 'count':
+        values = data['OVERALL_SENTIMENT'].eq(intent['sentiment']) if intent['sentiment'] else pd.Series(True, index=data.index)
+    else:
+        values = data[intent['column']]
+
+    if keys is None:
+        if metric == 'count':
+            return int(values.sum()), len(data)
+        if metric == 'share':
+            return (values.mean() * 100 if len(values) else float('nan')), len(data)
+        return values.mean(), int(values.notna().sum())
+
+    grouped = values.groupby(keys)
+    if metric == 'count':
+        result = grouped.sum().astype(int).rename('VALUE').to_frame()
+    elif metric == 'share':
+        result = (grouped.mean() * 100).round(1).rename('VALUE').to_frame()
+    else:
+        result = grouped.mean().round(2).rename('VALUE').to_frame()
+    result['REVIEWS'] = grouped.count() if metric in ('mean', 'detailed') else keys.value_counts()
+    result = result.reset_index()
+
+    if intent['order'] is not None:
+        ranked = result
+        if metric != 'count':
+            ranked = result[result['REVIEWS'] >= min(MIN_REVIEWS_FOR_RANKING, result['REVIEWS'].max())]
+        result = ranked.sort_values(['VALUE', 'REVIEWS'], ascending=[intent['order'] == 'asc', False])
+        if intent['top_n']:
+            result = result.head(intent['top_n'])
+    elif dimension in PERIODS:
+        result = result.sort_values(dimension)
+    else:
+        result = result.sort_values('VALUE', ascending=False)
+    # The row limit is applied by answer_question, which also says when it cut the table
+    return result.reset_index(drop=True), None
+
+
+def _metric_label(intent):
+    if intent['metric'] == 'share':
+        return f"share of {intent['sentiment'].lower()} reviews"
+    if intent['metric'] == 'count':
+        return f"number of {intent['sentiment'].lower()} reviews" if intent['sentiment'] else 'number of reviews'
+    if intent['metric'] == 'detailed':
+        label = f"average {intent['column'].replace('REVIEW_DETAILED_', '').lower()} rating"
+    else:
+        label = 'average rating'
+    return f"{label} of {intent['sentiment'].lower()} reviews" if intent['sentiment'] else label
+
+
+def _scope_label(intent):
+    parts = []
+    for values in intent['filters'].values():
+        parts.append(', '.join(values))
+    if intent['window'] is not None:
+        parts.append(intent['window'][2])
+    return f" ({'; '.join(parts)})" if parts else ''
+
+
+def answer_question(question, data):
+    intent = parse_question(question, data)
+    if intent is None:
+        return None
+    result, size = run_query(intent, data)
+    label = _metric_label(intent)
+    scope = _scope_label(intent)
+
+    if size is not None:
+        if pd.isna(result):
+            text = f"There are no reviews matching this question{scope}."
+        elif intent['metric'] == 'count':
+            text = f"The {label}{scope} is **{result:,}**."
+        elif intent['metric'] == 'share':
+            text = f"The {label}{scope} is **{result:.1f}%** out of {size:,} reviews."
+        else:
+            text = f"The {label}{scope} is **{result:.2f}** across {size:,} reviews."
+        return text, None
+
+    dimension, dimension_plural = DIMENSION_LABELS[intent['dimension']]
+    if result.empty:
+        return f"There are no reviews matching this question{scope}.", None
+    value_label = f"{label.capitalize()} (%)" if intent['metric'] == 'share' else label.capitalize()
+    table = result.rename(columns={intent['dimension']: dimension.capitalize(), 'VALUE': value_label, 'REVIEWS': 'Reviews'})
+    if intent['order'] is not None and len(result) == 1:
+        key = result[intent['dimension']].iloc[0]
+        value = result['VALUE'].iloc[0]
+        value = f"{value:,}" if intent['metric'] == 'count' else f"{value:.1f}%" if intent['metric'] == 'share' else f"{value:.2f}"
+        text = f"The {dimension} with the {'lowest' if intent['order'] == 'asc' else 'highest'} {label}{scope} is **{key}** ({value})."
+    else:
+        text = f"Here is the {label} per {dimension}{scope}."
+    if intent['order'] is not None and intent['metric'] != 'count':
+        text += f" Only {dimension_plural} with at least {MIN_REVIEWS_FOR_RANKING} reviews are ranked."
+    if len(table) > ROW_LIMIT:
+        # Periods keep the most recent rows, everything else the first rows of its ordering
+        if intent['dimension'] in PERIODS and intent['order'] is None:
+            table = table.tail(ROW_LIMIT)
+            text += f" Only the most recent {ROW_LIMIT} of {len(result):,} {dimension_plural} are shown."
+        else:
+            table = table.head(ROW_LIMIT)
+            text += f" Only the first {ROW_LIMIT} of {len(result):,} {dimension_plural} are shown."
+    return text, table
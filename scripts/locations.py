@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import pydeck as pdk
 
+from scripts.timing import timed
+
 def get_color(rating):
     if rating <= 1:
         return [234, 67, 53, 255]
@@ -14,6 +16,7 @@ def get_color(rating):
     else:
         return [52, 168, 83, 255]
 
+@timed('tab.locations')
 def locations(data):
     map_data = data.groupby(['ADDRESS', 'LATITUDE', 'LONGITUDE', 'STATE', 'PLACE_TOTAL_SCORE']).agg({
         'REVIEW_ID': 'count',
@@ -1,98 +1,257 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import os
+import re
 
-from PIL import Image
-from io import BytesIO
-from openai import OpenAI
-from tempfile import gettempdir
+from functools import partial
 
-from scripts.sapi import write_table
+from openai import OpenAI, RateLimitError
 
-client = OpenAI(api_key=st.secrets['OPENAI_API_KEY'])
+from scripts.image_cache import get_image_cache
+from scripts.local_query import answer_question
+from scripts.sapi import upload_table
+from scripts.scheduler import BATCH, INTERACTIVE, estimate_tokens, get_scheduler
+from scripts.session import append_message, visible_messages
+from scripts.thread_pool import ThreadPool
+from scripts.timing import gauge, timed
+from scripts.uploads import UploadCache
 
-def generate_response(prompt):
+class _LazyClient:
+    # Defers building the OpenAI client until the first request
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+
+@st.cache_resource
+def get_client():
+    # Retries are owned by the shared scheduler
+    return OpenAI(api_key=st.secrets['OPENAI_API_KEY'], max_retries=0)
+
+
+client = _LazyClient()
+
+@timed('openai.generate_response')
+def generate_response(prompt, priority=INTERACTIVE):
+    scheduler = get_scheduler()
     try:
-        completion = client.chat.completions.create(
+        completion = scheduler.submit(
+            client.chat.completions.create,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.4
+            temperature=0.4,
+            priority=priority,
+            tokens=estimate_tokens(prompt),
+            key=('chat', prompt)
         )
         return completion.choices[0].message.content
+    except RateLimitError:
+        st.error("The AI service is busy right now. Please try again in a minute.")
+        return ''
     except Exception as e:
         st.error(f"An error occurred during content generation. Please try again.")
         return ''
 
 
-def assistant(file_id, assistant_id, bot_data):
+IMAGE_MARKER = re.compile(r'\[Image: ([^\]]+)\]\n?')
+
+
+@timed('openai.fetch_image')
+def fetch_image(file_id, scheduler):
+    cache = get_image_cache()
+    data = cache.get(file_id)
+    if data is not None:
+        return data
+    resp = scheduler.submit(client.files.with_raw_response.retrieve_content, file_id, key=('file', file_id))
+    if resp.status_code != 200:
+        return None
+    # Keep the PNG bytes as returned, st.image serves them without decoding
+    data = resp.content
+    cache.put(file_id, data)
+    return data
+
+
+def render_message_content(content, scheduler):
+    parts = IMAGE_MARKER.split(content)
+    for i, part in enumerate(parts):
+        if i % 2:
+            data = fetch_image(part, scheduler)
+            if data:
+                st.image(data)
+        elif part.strip():
+            st.markdown(part)
+
+
+@timed('openai.stream_run')
+def stream_run(thread_id, assistant_id, scheduler, tokens=0):
+    status = st.status('🤖 Analyzing, please wait...', expanded=False)
+    code_placeholder = status.empty()
+    code = ''
+    images = {}
+    text_placeholder = None
+    text = ''
+    complete_message_content = ''
+    run_status = None
+
+    with scheduler.stream(client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id), tokens=tokens) as stream:
+        for event in stream:
+            if event.event == 'thread.message.delta':
+                for delta in event.data.delta.content or []:
+                    if delta.type == 'text' and delta.text and delta.text.value:
+                        if text_placeholder is None:
+                            text_placeholder = st.empty()
+                        text += delta.text.value
+                        text_placeholder.markdown(text)
+                    elif delta.type == 'image_file' and delta.image_file and delta.image_file.file_id:
+                        if text:
+                            complete_message_content += text + "\n"
+                        text_placeholder, text = None, ''
+                        file_id = delta.image_file.file_id
+                        if file_id not in images:
+                            images[file_id] = fetch_image(file_id, scheduler)
+                        if images[file_id]:
+                            st.image(images[file_id])
+                            complete_message_content += f"[Image: {file_id}]\n"
+
+            elif event.event == 'thread.run.step.delta':
+                details = event.data.delta.step_details
+                if details is None or details.type != 'tool_calls':
+                    continue
+                for call in details.tool_calls or []:
+                    if call.type != 'code_interpreter' or call.code_interpreter is None:
+                        continue
+                    if call.code_interpreter.input:
+                        status.update(label='🧮 Running analysis code...')
+                        code += call.code_interpreter.input
+                        code_placeholder.code(code, language='python')
+                    # Fetch charts as soon as the interpreter produces them
+                    for output in call.code_interpreter.outputs or []:
+                        if output.type == 'image' and output.image and output.image.file_id not in images:
+                            images[output.image.file_id] = fetch_image(output.image.file_id, scheduler)
+
+            elif event.event == 'thread.run.step.created':
+                status.update(label='🤖 Analyzing, please wait...')
+
+            elif event.event in ('thread.run.completed', 'thread.run.failed', 'thread.run.cancelled',
+                                 'thread.run.expired', 'thread.run.incomplete', 'thread.run.requires_action'):
+                run_status = event.data.status
+
+    if text:
+        complete_message_content += text + "\n"
+    if run_status == 'completed':
+        status.update(label='✅ Analysis complete', state='complete')
+    else:
+        status.update(label=f'Run status: {run_status}', state='error')
+    return complete_message_content, run_status
+
+
+def create_thread(file_id, scheduler, background=False):
+    thread = scheduler.submit(
+        client.beta.threads.create,
+        priority=BATCH if background else INTERACTIVE,
+        messages=[
+            {
+                "role": "user",
+                "content": (
+                    "To help you navigate the CSV file, here is the description of some important columns: "
+                    "REVIEW_ID: Unique identifier for the feedback. "
+                    "FEEDBACK_CHANNEL: Source channel of the feedback (e.g., platform or app). "
+                    "PLACE_ID: Unique identifier for the place being reviewed. "
+                    "PLACE_TOTAL_SCORE: The total score of the place based on reviews. "
+                    "PLACE_REVIEWS_COUNT: Number of reviews for the place. "
+                    "LATITUDE/LONGITUDE: Geographical coordinates of the place. "   
+                    "REVIEWER_NAME: Name of the customer. "
+                    "REVIEW_DATE: Date when the feedback was given. " 
+                    "RATING: The rating given by the reviewer (on a scale). "
+                    "REVIEW_CONTEXT_MEAL_TYPE: Type of meal mentioned in the review. "
+                    "REVIEW_CONTEXT_SERVICE: Type of service mentioned. "
+                    "REVIEW_DETAILED_FOOD/SERVICE/ATMOSPHERE: Specific ratings for food, service, and atmosphere. "  
+                    "REVIEW_TEXT: Text content of the review. "
+                    "OVERALL_SENTIMENT: Sentiment analysis result for the feedback (e.g., positive, negative). "
+                    "CITY/STATE/POSTAL_CODE: Location details of the place."
+                ),
+                "attachments": [
+                    {
+                    "file_id": file_id, #file.id,
+                    "tools": [{"type": "code_interpreter"}]
+                    }
+                ]
+            }
+        ]
+    )
+    return thread.id
+
+
+def log_thread(thread_id, created_at):
+    df_log = pd.DataFrame({
+        'thread_id': [thread_id],
+        'created_at': [created_at]
+    })
+    upload_table(table_id='in.c-257-bot-log.logging', df=df_log, is_incremental=True)
+
+
+def record_exchange(thread_id, prompt, answer, scheduler):
+    for role, content in (("user", prompt), ("assistant", answer)):
+        scheduler.submit(client.beta.threads.messages.create, thread_id, role=role, content=content, priority=BATCH)
+
+
+@st.cache_resource
+def get_thread_pool(file_id):
+    scheduler = get_scheduler()
+    return ThreadPool(partial(create_thread, file_id, scheduler), size=st.secrets.get('THREAD_POOL_SIZE', 3))
+
+
+def defer(file_id, label, fn, *args):
+    st.session_state.deferred_tasks.append((label, get_thread_pool(file_id).defer(fn, *args)))
+
+
+def report_deferred():
+    # Failures of tasks run on the pool thread are shown on the next rerun of the session that deferred them
+    pending = []
+    for label, future in st.session_state.deferred_tasks:
+        if not future.done():
+            pending.append((label, future))
+        elif future.exception() is not None:
+            st.error(f'{label} failed with: {future.exception()}')
+    st.session_state.deferred_tasks = pending
+
+
+@st.cache_resource
+def get_upload_cache():
+    return UploadCache(client, get_scheduler(), max_files=st.secrets.get('UPLOAD_CACHE_FILES', 50))
+
+
+@timed('tab.assistant')
+def assistant(file_id, assistant_id, bot_data, is_filtered=False):
+    scheduler = get_scheduler()
+    gauge('openai.scheduler', scheduler.stats())
+    report_deferred()
+    if st.session_state.attached_file_id not in (None, file_id):
+        get_upload_cache().touch(st.session_state.attached_file_id)
     if st.session_state.thread_id is None:
-        thread = client.beta.threads.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": (
-                        "To help you navigate the CSV file, here is the description of some important columns: "
-                        "REVIEW_ID: Unique identifier for the feedback. "
-                        "FEEDBACK_CHANNEL: Source channel of the feedback (e.g., platform or app). "
-                        "PLACE_ID: Unique identifier for the place being reviewed. "
-                        "PLACE_TOTAL_SCORE: The total score of the place based on reviews. "
-                        "PLACE_REVIEWS_COUNT: Number of reviews for the place. "
-                        "LATITUDE/LONGITUDE: Geographical coordinates of the place. "   
-                        "REVIEWER_NAME: Name of the customer. "
-                        "REVIEW_DATE: Date when the feedback was given. " 
-                        "RATING: The rating given by the reviewer (on a scale). "
-                        "REVIEW_CONTEXT_MEAL_TYPE: Type of meal mentioned in the review. "
-                        "REVIEW_CONTEXT_SERVICE: Type of service mentioned. "
-                        "REVIEW_DETAILED_FOOD/SERVICE/ATMOSPHERE: Specific ratings for food, service, and atmosphere. "  
-                        "REVIEW_TEXT: Text content of the review. "
-                        "OVERALL_SENTIMENT: Sentiment analysis result for the feedback (e.g., positive, negative). "
-                        "CITY/STATE/POSTAL_CODE: Location details of the place."
-                    ),
-                    "attachments": [
-                        {
-                        "file_id": file_id, #file.id,
-                        "tools": [{"type": "code_interpreter"}]
-                        }
-                    ]
-                }
-            ]
-        )
-        st.session_state.thread_id = thread.id
+        st.session_state.thread_id = get_thread_pool(file_id).take()
 
     if not st.session_state.table_written:
-        df_log = pd.DataFrame({
-            'thread_id': [st.session_state.thread_id],
-            'created_at': [datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-        })
-
-        write_table(table_id='in.c-257-bot-log.logging', df=df_log, is_incremental=True)
+        created_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        defer(file_id, 'Logging the thread', log_thread, st.session_state.thread_id, created_at)
         st.session_state.table_written = True
 
     with st.expander("Data"):
         st.dataframe(bot_data, hide_index=True)
         #st.caption(f'Thread ID: {st.session_state.thread_id}')
 
-    for message in st.session_state.messages:
+    for message in visible_messages():
         if message["role"] == "user":
             avatar = '🧑‍💻'
         else:
             avatar = st.secrets['MINI_LOGO_URL']
         
         with st.chat_message(message["role"], avatar=avatar):
-            if "[Image:" in message["content"]:
-                start_index = message["content"].find("[Image:") + len("[Image: ")
-                end_index = message["content"].find("]", start_index)
-                image_path = message["content"][start_index:end_index]
-                st.image(image_path)
-                
-                text_content = message["content"][:start_index - len("[Image: ")] + message["content"][end_index + 1:]
-                st.markdown(text_content)
-            else:
-                st.markdown(message["content"])
+            render_message_content(message["content"], scheduler)
+            if message.get("table") is not None:
+                st.dataframe(message["table"], hide_index=True)
         placeholder = st.empty()
     styl = f"""
         <style>
@@ -130,51 +289,51 @@ def assistant(file_id, assistant_id, bot_data):
     text_input = st.text_input("Query", placeholder="Your query", label_visibility='collapsed')
     if prompt := text_input:
         with placeholder.container():
-            st.session_state.messages.append({"role": "user", "content": prompt})
+            append_message({"role": "user", "content": prompt})
             with st.chat_message("user", avatar='🧑‍💻'):
                 st.markdown(prompt)
 
-            with st.spinner('🤖 Analyzing, please wait...'):  
-                thread_message = client.beta.threads.messages.create(
-                    st.session_state.thread_id,
-                    role="user",
-                    content=prompt,
-                )
-                run = client.beta.threads.runs.create_and_poll(
-                    thread_id=st.session_state.thread_id,
-                    assistant_id=assistant_id,
-                )
-
-            if run.status == 'completed':
-                messages = client.beta.threads.messages.list(
-                    thread_id=st.session_state.thread_id
-                )
-                newest_message = messages.data[0]
-                complete_message_content = ""
+            local_answer = answer_question(prompt, bot_data)
+            if local_answer is not None:
+                text, table = local_answer
                 with st.chat_message("assistant", avatar=st.secrets['MINI_LOGO_URL']):
-                    for message_content in newest_message.content:
-                        if hasattr(message_content, "image_file"):
-                            file_id = message_content.image_file.file_id
-
-                            resp = client.files.with_raw_response.retrieve_content(file_id)
-
-                            if resp.status_code == 200:
-                                image_data = BytesIO(resp.content)
-                                img = Image.open(image_data)
-                                
-                                temp_dir = gettempdir()
-                                image_path = os.path.join(temp_dir, f"{file_id}.png")
-                                img.save(image_path)
-                        
-                                st.image(img)
-                                complete_message_content += f"[Image: {image_path}]\n"
-
-                        elif hasattr(message_content, "text"):
-                            text = message_content.text.value
-                            st.markdown(text)
-                            complete_message_content += text + "\n"
+                    st.markdown(text)
+                    if table is not None:
+                        st.dataframe(table, hide_index=True)
+                    st.caption('_⚡ Answered instantly from the loaded data._')
+                append_message({"role": "assistant", "content": text, "table": table})
+                # Keep the thread aware of the exchange for follow-up questions
+                defer(file_id, 'Saving the exchange to the thread', record_exchange, st.session_state.thread_id, prompt, text, scheduler)
+                return
+
+            content = prompt
+            attachments = []
+            data_file_id = file_id
+            if is_filtered:
+                with st.spinner('Preparing the filtered data...'):
+                    data_file_id = get_upload_cache().file_for(bot_data)
+            if data_file_id != (st.session_state.attached_file_id or file_id):
+                if data_file_id == file_id:
+                    note = "From now on, analyze the original CSV file with all reviews again."
+                else:
+                    note = (f"From now on, analyze only the newly attached CSV file. It has the same columns and contains "
+                            f"the {len(bot_data):,} reviews matching the current dashboard filters.")
+                    attachments = [{"file_id": data_file_id, "tools": [{"type": "code_interpreter"}]}]
+                content = f"{note}\n\n{prompt}"
 
-                st.session_state.messages.append({"role": "assistant", "content": complete_message_content})
+            scheduler.submit(
+                client.beta.threads.messages.create,
+                st.session_state.thread_id,
+                role="user",
+                content=content,
+                attachments=attachments,
+            )
+            st.session_state.attached_file_id = data_file_id
+            with st.chat_message("assistant", avatar=st.secrets['MINI_LOGO_URL']):
+                complete_message_content, run_status = stream_run(
+                    st.session_state.thread_id, assistant_id, scheduler, tokens=estimate_tokens(prompt, completion=2000))
 
-            else:
-                st.write(f"Run status: {run.status}")
\ No newline at end of file
+            if complete_message_content:
+                append_message({"role": "assistant", "content": complete_message_content})
+            if run_status != 'completed':
+                st.write(f"Run status: {run_status}")
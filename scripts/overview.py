@@ -2,18 +2,66 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from scripts.timeseries import choose_resolution, period_start, rating_sparklines
+from scripts.timing import timed
+
 rating_colors_index = {'0': '#B3B3B3', '1': '#EA4335', '2': '#e98f41', '3': '#FBBC05', '4': '#a5c553', '5': '#34A853'}
 rating_colors = {0: '#B3B3B3', 1: '#EA4335', 2: '#e98f41', 3: '#FBBC05', 4: '#a5c553', 5: '#34A853'}
 
+def rating_distribution_figure(rating_distribution, title):
+    fig = px.bar(
+        rating_distribution,
+        x=rating_distribution.columns,
+        y=rating_distribution.index,
+        orientation='h',
+        labels={'value': 'Percentage', 'index': 'Location', 'rating': 'Rating', 'variable': 'Rating'},
+        title=title,
+        color_discrete_map=rating_colors_index
+    )
+    fig.update_traces(hovertemplate='%{x:.2%}<extra></extra>')
+    fig.update_layout(
+        showlegend=False, 
+        xaxis_title=None, 
+        yaxis_title=None, 
+        xaxis_tickformat='.0%',
+        xaxis={'showticklabels': False},
+        yaxis={'tickvals': rating_distribution.index, 'ticktext': rating_distribution.index}
+    )
+    return fig
+
+def ratings_per_period(data, resolution):
+    return data.groupby([period_start(data['REVIEW_DATE'], resolution), 'RATING']).size().reset_index(name='COUNT')
+
+def ratings_per_period_figure(count_ratings_per_day, title):
+    count_ratings_per_day = count_ratings_per_day.assign(RATING=count_ratings_per_day['RATING'].astype(str)).sort_values(by='RATING')
+
+    fig_count_ratings = px.bar(
+        count_ratings_per_day,
+        x='REVIEW_DATE',
+        y='COUNT',
+        color='RATING',
+        labels={'COUNT': 'Count', 'RATING': 'Rating', 'REVIEW_DATE': 'Date'},
+        title=title,
+        color_discrete_map=rating_colors_index,
+        opacity=0.8
+    )
+
+    fig_count_ratings.update_traces(hovertemplate='Count: %{y}<extra></extra>')
+    fig_count_ratings.update_layout(xaxis_title=None, showlegend=False, hovermode='x')
+    return fig_count_ratings
+
+@timed('tab.overview')
 def overview(data):
     data_rating_sorted = (
         data
         .groupby(['PLACE_ID', 'ADDRESS', 'PLACE_TOTAL_SCORE', 'PLACE_URL'])
-        .agg({'RATING': [lambda x: x.tolist(), 'count']})  
+        .agg(COUNT=('RATING', 'count'))
         .reset_index()  
-        .sort_values(by=['PLACE_TOTAL_SCORE', ('RATING', 'count')], ascending=[False, False])  
+        .sort_values(by=['PLACE_TOTAL_SCORE', 'COUNT'], ascending=[False, False])  
     )
-    data_rating_sorted.columns = ['PLACE_ID', 'ADDRESS', 'PLACE_TOTAL_SCORE', 'PLACE_URL', 'RATING', 'COUNT']
+    # Fixed-length sparkline per row instead of every rating of the location
+    data_rating_sorted['RATING'] = data_rating_sorted['PLACE_ID'].map(rating_sparklines(data))
+    rating_distribution = pd.crosstab(data['PLACE_ID'], data['RATING'], normalize='index')
 
     ## RATING DISTRIBUTION FOR TOP/BOTTOM X    
     col1, col2, col3 = st.columns([0.42, 0.42, 0.16], vertical_alignment='center', gap='small')
@@ -28,55 +76,23 @@ def overview(data):
     with col1:
         top_locations = data_rating_sorted[data_rating_sorted['COUNT'] >= num_reviews].head(top_x)
 
-        top_rating_distribution = top_locations['RATING'].apply(lambda ratings: pd.Series(ratings).value_counts(normalize=True).sort_index()).fillna(0)
+        top_rating_distribution = rating_distribution.reindex(top_locations['PLACE_ID'])
+        top_rating_distribution = top_rating_distribution.loc[:, top_rating_distribution.sum() > 0]
         top_rating_distribution.index = top_locations['ADDRESS']
         top_rating_distribution = top_rating_distribution.sort_index(axis=1, ascending=False).iloc[::-1]
         
-        fig_top = px.bar(
-            top_rating_distribution,
-            x=top_rating_distribution.columns,
-            y=top_rating_distribution.index,
-            orientation='h',
-            labels={'value': 'Percentage', 'index': 'Location', 'rating': 'Rating', 'variable': 'Rating'},
-            title=f'Rating Distribution for Top {top_x} Locations',
-            color_discrete_map=rating_colors_index
-        )
-        fig_top.update_traces(hovertemplate='%{x:.2%}<extra></extra>')
-        fig_top.update_layout(
-            showlegend=False, 
-            xaxis_title=None, 
-            yaxis_title=None, 
-            xaxis_tickformat='.0%',
-            xaxis={'showticklabels': False},
-            yaxis={'tickvals': top_rating_distribution.index, 'ticktext': top_rating_distribution.index}
-        )
+        fig_top = rating_distribution_figure(top_rating_distribution, f'Rating Distribution for Top {top_x} Locations')
         st.plotly_chart(fig_top, use_container_width=True)
         
     with col2:
         bottom_locations = data_rating_sorted[data_rating_sorted['COUNT'] >= num_reviews].tail(top_x)
         
-        bottom_rating_distribution = bottom_locations['RATING'].apply(lambda ratings: pd.Series(ratings).value_counts(normalize=True).sort_index()).fillna(0)
+        bottom_rating_distribution = rating_distribution.reindex(bottom_locations['PLACE_ID'])
+        bottom_rating_distribution = bottom_rating_distribution.loc[:, bottom_rating_distribution.sum() > 0]
         bottom_rating_distribution.index = bottom_locations['ADDRESS']
         bottom_rating_distribution = bottom_rating_distribution.sort_index(axis=1, ascending=False)
 
-        fig_bottom = px.bar(
-            bottom_rating_distribution,
-            x=bottom_rating_distribution.columns,
-            y=bottom_rating_distribution.index,
-            orientation='h',
-            labels={'value': 'Percentage', 'index': 'Location', 'rating': 'Rating', 'variable': 'Rating'},
-            title=f'Rating Distribution for Bottom {top_x} Locations',
-            color_discrete_map=rating_colors_index
-        )
-        fig_bottom.update_traces(hovertemplate='%{x:.2%}<extra></extra>')
-        fig_bottom.update_layout(
-            showlegend=False, 
-            xaxis_title=None, 
-            yaxis_title=None, 
-            xaxis_tickformat='.0%',
-            xaxis={'showticklabels': False},
-            yaxis={'tickvals': bottom_rating_distribution.index, 'ticktext': bottom_rating_distribution.index}
-        )
+        fig_bottom = rating_distribution_figure(bottom_rating_distribution, f'Rating Distribution for Bottom {top_x} Locations')
         st.plotly_chart(fig_bottom, use_container_width=True)
 
     st.dataframe(
@@ -136,22 +152,8 @@ def overview(data):
     
     ## COUNT OF RATINGS PER DAY
     with col2:
-        data['REVIEW_DATE'] = pd.to_datetime(data['REVIEW_DATE']).dt.date
-        count_ratings_per_day = data.groupby(['REVIEW_DATE', 'RATING']).size().reset_index(name='COUNT')
-        count_ratings_per_day['RATING'] = count_ratings_per_day['RATING'].astype(str)
-        count_ratings_per_day = count_ratings_per_day.sort_values(by='RATING')
-
-        fig_count_ratings = px.bar(
-            count_ratings_per_day,
-            x='REVIEW_DATE',
-            y='COUNT',
-            color='RATING',
-            labels={'COUNT': 'Count', 'RATING': 'Rating', 'REVIEW_DATE': 'Date'},
-            title='Count of Ratings Per Day Across All Selected Locations',
-            color_discrete_map=rating_colors_index,
-            opacity=0.8
-        )
-
-        fig_count_ratings.update_traces(hovertemplate='Count: %{y}<extra></extra>')
-        fig_count_ratings.update_layout(xaxis_title=None, showlegend=False, hovermode='x')
+        # Long ranges are bucketed per week or month so the number of bars stays bounded
+        resolution = choose_resolution(data['REVIEW_DATE'].min(), data['REVIEW_DATE'].max())
+        count_ratings_per_day = ratings_per_period(data, resolution)
+        fig_count_ratings = ratings_per_period_figure(count_ratings_per_day, f'Count of Ratings Per {resolution} Across All Selected Locations')
         st.plotly_chart(fig_count_ratings, use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,66 @@
+import logging
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class DataRefresher:
+    def __init__(self, load, load_changes=None, key=None, interval=1800, full_every=12):
+        self.interval = interval
+        self.full_every = full_every
+        self._load = load
+        self._load_changes = load_changes
+        self._key = key
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._syncs = 0
+        self.last_error = None
+        self._worker = threading.Thread(target=self._run, name='reviews-refresher', daemon=True)
+
+    def snapshot(self):
+        # Returns (data, loaded_at) with loaded_at in UTC; only the very first caller waits for a load
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = (self._checked(self._load()), pd.Timestamp.now(tz='UTC'))
+                    self._worker.start()
+            snapshot = self._snapshot
+        data, loaded_at = snapshot
+        # Every session gets its own shallow copy; Copy-on-Write (always on since pandas 3) keeps its writes off the snapshot
+        return data.copy(deep=False), loaded_at
+
+    def _checked(self, data):
+        if data is None or data.empty:
+            raise ValueError('Refresh returned no rows')
+        return data
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._refresh()
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the last good snapshot
+                self.last_error = str(e)
+                logger.exception('Refreshing reviews failed')
+
+    def _refresh(self):
+        data, loaded_at = self._snapshot
+        started_at = pd.Timestamp.now(tz='UTC')
+        self._syncs += 1
+        if self._load_changes is not None and self._key is not None and self._syncs % self.full_every:
+            try:
+                changes = self._load_changes(loaded_at)
+            except Exception:
+                logger.exception('Delta sync failed, falling back to a full reload')
+            else:
+                if not changes.empty:
+                    data = pd.concat([data[~data[self._key].isin(changes[self._key])], changes], ignore_index=True)
+                self._snapshot = (data, started_at)
+                return
+        self._snapshot = (self._checked(self._load()), started_at)
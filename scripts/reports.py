@@ -0,0 +1,223 @@
+# Usage: python -m scripts.reports DATA_DIR OUTPUT_DIR [--days 7] [--trend-days 90] [--format html|pdf] [--workers N]
+import argparse
+import html
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.ai_analysis import (average_rating_figure, average_rating_per_period, detailed_rating_figure,
+                                 detailed_rating_per_period, entity_figure, top_entities)
+from scripts.overview import rating_distribution_figure, ratings_per_period, ratings_per_period_figure
+from scripts.shared_data import read_manifest, read_shared
+from scripts.timeseries import choose_resolution
+
+TOP_ENTITIES = 10
+FIGURE_WIDTH = 1000
+FIGURE_HEIGHT = 400
+
+# Set in the parent before the pool forks, so workers read the same pages instead of copies
+_DATA = None
+
+
+def load_tables(source):
+    # A shared_data directory is memory-mapped, anything else is read as the dashboard CSVs
+    source = Path(source)
+    names = ['locations', 'reviews', 'sentences', 'entities']
+    if (source / 'manifest.json').exists():
+        version = read_manifest(source)['version']
+        return {name: read_shared(source, name, version) for name in names}
+    return {name: pd.read_csv(source / f'{name}.csv') for name in names}
+
+
+def _positions(keys):
+    # Row positions per key, found with one sort instead of a scan per location
+    return {key: np.asarray(rows) for key, rows in keys.groupby(keys, sort=False).indices.items()}
+
+
+def prepare(tables, days, trend_days, end=None):
+    reviews = tables['reviews'].merge(tables['locations'][['PLACE_ID', 'BRAND', 'ADDRESS', 'CITY', 'STATE']], on='PLACE_ID', how='inner')
+    reviews['REVIEW_DATE'] = pd.to_datetime(reviews['REVIEW_DATE'])
+    end = pd.Timestamp(end).normalize() if end is not None else reviews['REVIEW_DATE'].max().normalize()
+    end += pd.Timedelta(days=1)
+    reviews = reviews[reviews['REVIEW_DATE'].between(end - pd.Timedelta(days=max(days, trend_days)), end, inclusive='left')]
+    reviews = reviews.reset_index(drop=True)
+    recent = reviews['REVIEW_DATE'] >= end - pd.Timedelta(days=days)
+
+    # Sentences and entities only for the reviews of the report period, tagged with their location
+    place_of = reviews[recent].set_index('REVIEW_ID')['PLACE_ID']
+    sentences = tables['sentences'][tables['sentences']['REVIEW_ID'].isin(place_of.index)].reset_index(drop=True)
+    entities = tables['entities'][tables['entities']['REVIEW_ID'].isin(place_of.index)].reset_index(drop=True)
+
+    brand_distribution = pd.crosstab(reviews.loc[recent, 'BRAND'], reviews.loc[recent, 'RATING'], normalize='index')
+    # Every location gets a report, also those without reviews in the trend period
+    locations = tables['locations'].drop_duplicates('PLACE_ID').set_index('PLACE_ID')['ADDRESS']
+    return {
+        'locations': locations,
+        'start': end - pd.Timedelta(days=days),
+        'end': end - pd.Timedelta(days=1),
+        'trend_start': end - pd.Timedelta(days=trend_days),
+        'reviews': reviews,
+        'recent': recent.to_numpy(),
+        'sentences': sentences,
+        'entities': entities,
+        'brand_distribution': brand_distribution,
+        'review_rows': _positions(reviews['PLACE_ID']),
+        'sentence_rows': _positions(sentences['REVIEW_ID'].map(place_of)),
+        'entity_rows': _positions(entities['REVIEW_ID'].map(place_of)),
+    }
+
+
+def _rows(frame, positions, key):
+    return frame.iloc[positions.get(key, np.array([], dtype=int))]
+
+
+def location_figures(place_id):
+    data = _DATA
+    rows = data['review_rows'].get(place_id, np.array([], dtype=int))
+    location = data['reviews'].iloc[rows]
+    recent = location[data['recent'][rows]]
+    trend = location[location['REVIEW_DATE'] >= data['trend_start']]
+    figures = []
+    # A quiet week still gets the rating trends, only the charts of the report period are skipped
+    if not recent.empty:
+        address = recent['ADDRESS'].iloc[0]
+        brand = recent['BRAND'].iloc[0]
+        distribution = pd.concat([
+            pd.crosstab(recent['ADDRESS'], recent['RATING'], normalize='index'),
+            data['brand_distribution'].loc[[brand]].rename(index={brand: f'All {brand} locations'}),
+        ]).fillna(0)
+        distribution = distribution.loc[:, distribution.sum() > 0].sort_index(axis=1, ascending=False).iloc[::-1]
+        resolution = choose_resolution(data['start'], data['end'])
+        figures += [
+            rating_distribution_figure(distribution, f'Rating Distribution for {address} vs. All {brand} Locations'),
+            ratings_per_period_figure(ratings_per_period(recent, resolution), f'Count of Ratings Per {resolution}'),
+        ]
+
+    if not trend.empty:
+        trend_resolution = choose_resolution(data['trend_start'], data['end'])
+        figures += [
+            average_rating_figure(average_rating_per_period(trend, trend_resolution), trend_resolution),
+            detailed_rating_figure(detailed_rating_per_period(trend, trend_resolution), trend_resolution),
+        ]
+
+    sentences = _rows(data['sentences'], data['sentence_rows'], place_id)
+    entities = _rows(data['entities'], data['entity_rows'], place_id)
+    positive = top_entities(sentences, entities, 'Positive', TOP_ENTITIES)
+    if not positive.empty:
+        figures.append(entity_figure(positive, 'Positive Entities', '#34A853'))
+    negative = top_entities(sentences, entities, 'Negative', TOP_ENTITIES)
+    if not negative.empty:
+        figures.append(entity_figure(negative, 'Negative Entities', '#EA4335', text_color='white'))
+    return location, recent, figures
+
+
+def _summary(recent):
+    if recent.empty:
+        return 'No reviews in the report period.'
+    return f"{len(recent):,} reviews, average rating {recent['RATING'].mean():.2f}"
+
+
+def write_html(path, title, period, summary, figures):
+    charts = ''.join(
+        fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False, default_width='100%')
+        for i, fig in enumerate(figures)
+    )
+    path.write_text(
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title></head>'
+        f'<body style="font-family: sans-serif; max-width: {FIGURE_WIDTH}px; margin: auto">'
+        f'<h2>{html.escape(title)}</h2><p>{html.escape(period)}<br>{html.escape(summary)}</p>{charts}</body></html>',
+        encoding='utf-8')
+
+
+def write_pdf(path, title, period, summary, figures):
+    # Plotly renders each chart through kaleido, matplotlib lays the images out one per page
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(path) as pdf:
+        page = plt.figure(figsize=(11, 8.5))
+        page.text(0.05, 0.9, title, fontsize=18, weight='bold')
+        page.text(0.05, 0.85, f'{period}\n{summary}', fontsize=12, va='top')
+        pdf.savefig(page)
+        plt.close(page)
+        for fig in figures:
+            image = plt.imread(io.BytesIO(fig.to_image(format='png', width=FIGURE_WIDTH, height=FIGURE_HEIGHT)), format='png')
+            page, ax = plt.subplots(figsize=(11, 8.5))
+            ax.imshow(image)
+            ax.axis('off')
+            pdf.savefig(page)
+            plt.close(page)
+
+
+def render_location(place_id, output_dir, file_format):
+    started = time.perf_counter()
+    location, recent, figures = location_figures(place_id)
+    address = _DATA['locations'].get(place_id, place_id)
+    title = f'Weekly Report: {address}'
+    period = f"{_DATA['start'].date()} to {_DATA['end'].date()}"
+    name = re.sub(r'[^\w.-]', '_', str(place_id))
+    path = Path(output_dir) / f'{name}.{file_format}'
+    writer = write_pdf if file_format == 'pdf' else write_html
+    writer(path, title, period, _summary(recent), figures)
+    return place_id, address, time.perf_counter() - started
+
+
+def _init(source, days, trend_days, end):
+    # Only needed where workers are spawned rather than forked
+    global _DATA
+    if _DATA is None:
+        _DATA = prepare(load_tables(source), days, trend_days, end)
+
+
+def main():
+    global _DATA
+    parser = argparse.ArgumentParser(description='Render a static weekly report for every location.')
+    parser.add_argument('data_dir', help='directory with the dashboard CSVs or a shared_data export')
+    parser.add_argument('output_dir')
+    parser.add_argument('--days', type=int, default=7, help='report period')
+    parser.add_argument('--trend-days', type=int, default=90, help='history shown in the rating trends')
+    parser.add_argument('--end', help='last day of the report period, defaults to the newest review')
+    parser.add_argument('--format', choices=['html', 'pdf'], default='html')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--locations', nargs='*', help='only these PLACE_IDs')
+    args = parser.parse_args()
+    if args.format == 'pdf' and importlib.util.find_spec('kaleido') is None:
+        parser.error('PDF output needs the kaleido package (pip install kaleido)')
+
+    started = time.perf_counter()
+    _DATA = prepare(load_tables(args.data_dir), args.days, args.trend_days, args.end)
+    place_ids = args.locations or _DATA['locations'].index.tolist()
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    print(f"Loaded {len(_DATA['reviews']):,} reviews for {len(place_ids):,} locations in {time.perf_counter() - started:.1f}s")
+
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if fork else None)
+    durations = []
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=None if fork else _init,
+                             initargs=() if fork else (args.data_dir, args.days, args.trend_days, args.end)) as pool:
+        futures = [pool.submit(render_location, place_id, args.output_dir, args.format) for place_id in place_ids]
+        for done, future in enumerate(as_completed(futures), start=1):
+            place_id, address, seconds = future.result()
+            durations.append(seconds)
+            print(f'[{done}/{len(futures)}] {address} {seconds:.2f}s')
+
+    total = time.perf_counter() - started
+    if durations:
+        p50, p95 = np.percentile(durations, [50, 95])
+        print(f'Wrote {len(durations):,} reports to {args.output_dir} in {total:.1f}s '
+              f'({len(durations) / total:.1f}/s, per report p50 {p50:.2f}s, p95 {p95:.2f}s, {args.workers} workers)')
+
+
+if __name__ == '__main__':
+    main()
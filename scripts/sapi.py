@@ -1,19 +1,51 @@
 import streamlit as st
 import pandas as pd
 import os
+import tempfile
 
-from kbcstorage.client import Client, Files
 from keboola_streamlit import KeboolaStreamlit
 
-kbc_client = Client(st.secrets['kbc_url'], st.secrets['KEBOOLA_TOKEN'])
+from scripts.timing import timed
 
-@st.cache_data(show_spinner='Loading data...🍟🍔🧋')
-def read_data(table_name):
+
+@st.cache_resource
+def get_kbc_client():
+    # kbcstorage is only needed for writes, so it is imported on first use
+    from kbcstorage.client import Client
+    return Client(st.secrets['kbc_url'], st.secrets['KEBOOLA_TOKEN'])
+
+def load_table(table_name):
     keboola = KeboolaStreamlit(st.secrets['kbc_url'], st.secrets['KEBOOLA_TOKEN'])
     df = keboola.read_table(table_name)
     return df
 
-def write_table(table_id: str, df: pd.DataFrame, is_incremental: bool = False):    
+@timed('sapi.read_data')
+@st.cache_data(show_spinner='Loading data...🍟🍔🧋')
+def read_data(table_name):
+    return load_table(table_name)
+
+@timed('sapi.read_changes')
+def read_changes(table_name, since):
+    # Rows imported into the table after `since`, which has to be timezone-aware for the epoch to be right
+    with tempfile.TemporaryDirectory() as tmp:
+        path = get_kbc_client().tables.export_to_file(table_id=table_name, path_name=tmp, changed_since=int(since.timestamp()))
+        return pd.read_csv(path)
+
+@st.cache_resource
+def get_refresher(table_name, key):
+    from scripts.refresh import DataRefresher
+    return DataRefresher(
+        load=lambda: load_table(table_name),
+        load_changes=lambda since: read_changes(table_name, since),
+        key=key,
+        interval=st.secrets.get('refresh_minutes', 30) * 60,
+    )
+
+@timed('sapi.write_table')
+def upload_table(table_id: str, df: pd.DataFrame, is_incremental: bool = False):
+    # Raises on failure, so it is safe to call off the script thread
+    from kbcstorage.client import Files
+
     csv_path = f'{table_id}.csv'
     try:
         df.to_csv(csv_path, index=False)
@@ -21,11 +53,15 @@ def write_table(table_id: str, df: pd.DataFrame, is_incremental: bool = False):
         files = Files(st.secrets['kbc_url'], st.secrets['KEBOOLA_TOKEN'])
         file_id = files.upload_file(file_path=csv_path, tags=['file-import'],
                                     do_notify=False, is_public=False)
-        job = kbc_client.tables.load_raw(table_id=table_id, data_file_id=file_id, is_incremental=is_incremental)
-        
-    except Exception as e:
-        st.error(f'Data upload failed with: {str(e)}')
+        return get_kbc_client().tables.load_raw(table_id=table_id, data_file_id=file_id, is_incremental=is_incremental)
     finally:
         if os.path.exists(csv_path):
             os.remove(csv_path)
+
+def write_table(table_id: str, df: pd.DataFrame, is_incremental: bool = False):    
+    job = None
+    try:
+        job = upload_table(table_id, df, is_incremental)
+    except Exception as e:
+        st.error(f'Data upload failed with: {str(e)}')
     return job
\ No newline at end of file
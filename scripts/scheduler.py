@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+
+import streamlit as st
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+INTERACTIVE = 0
+BATCH = 1
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class RequestScheduler:
+    def __init__(self, requests_per_minute=500, tokens_per_minute=30000, max_retries=5, base_delay=1.0, max_delay=30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._in_flight = {}
+        self._latencies = deque(maxlen=500)
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'retried': 0, 'coalesced': 0, 'rate_limited': 0}
+
+    def submit(self, fn, *args, priority=INTERACTIVE, tokens=0, key=None, **kwargs):
+        # Identical in-flight requests share the first caller's result
+        if key is not None:
+            with self._cond:
+                leader = self._in_flight.get(key)
+                if leader is None:
+                    self._in_flight[key] = Future()
+                else:
+                    self._counters['coalesced'] += 1
+            if leader is not None:
+                return leader.result()
+
+        try:
+            result = self._run(fn, args, kwargs, priority, tokens)
+        except Exception as e:
+            if key is not None:
+                self._resolve(key, exception=e)
+            raise
+        if key is not None:
+            self._resolve(key, result=result)
+        return result
+
+    def stream(self, manager, priority=INTERACTIVE, tokens=0):
+        # Wraps a streaming context manager, opening it with the same retries as submit()
+        return _Stream(self, manager, priority, tokens)
+
+    def stats(self):
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = dict(self._counters)
+            stats['queue_depth'] = len(self._queue)
+            stats['queue_depth_interactive'] = sum(1 for item in self._queue if item[0] == INTERACTIVE)
+            stats['queue_depth_batch'] = sum(1 for item in self._queue if item[0] == BATCH)
+            stats['in_flight_keys'] = len(self._in_flight)
+        stats['latency_p50'] = _percentile(latencies, 0.5)
+        stats['latency_p95'] = _percentile(latencies, 0.95)
+        return stats
+
+    def _run(self, fn, args, kwargs, priority, tokens):
+        with self._cond:
+            self._counters['submitted'] += 1
+        started_at = time.monotonic()
+        result = self._attempt(fn, args, kwargs, priority, tokens)
+        self._record(started_at)
+        return result
+
+    def _attempt(self, fn, args, kwargs, priority, tokens):
+        attempt = 0
+        while True:
+            self._acquire(priority, tokens)
+            try:
+                return fn(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                with self._cond:
+                    if isinstance(e, RateLimitError):
+                        self._counters['rate_limited'] += 1
+                    if attempt >= self.max_retries:
+                        self._counters['failed'] += 1
+                        raise
+                    self._counters['retried'] += 1
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+            except Exception:
+                with self._cond:
+                    self._counters['failed'] += 1
+                raise
+
+    def _acquire(self, priority, tokens):
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if self._queue[0] == ticket:
+                        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if wait == 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(tokens)
+                            return
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                retry_after = None
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        # Full jitter keeps retrying sessions from synchronizing
+        delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _record(self, started_at):
+        with self._cond:
+            self._latencies.append(time.monotonic() - started_at)
+            self._counters['completed'] += 1
+
+    def _resolve(self, key, result=None, exception=None):
+        with self._cond:
+            future = self._in_flight.pop(key, None)
+        if future is None:
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+
+class _Stream:
+    def __init__(self, scheduler, manager, priority, tokens):
+        self.scheduler = scheduler
+        self.manager = manager
+        self.priority = priority
+        self.tokens = tokens
+
+    def __enter__(self):
+        with self.scheduler._cond:
+            self.scheduler._counters['submitted'] += 1
+        self.started_at = time.monotonic()
+        # Only opening is retried, once events have been rendered a failure is left to the caller
+        return self.scheduler._attempt(self.manager.__enter__, (), {}, self.priority, self.tokens)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.manager.__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            self.scheduler._record(self.started_at)
+        else:
+            with self.scheduler._cond:
+                self.scheduler._counters['failed'] += 1
+                if issubclass(exc_type, RateLimitError):
+                    self.scheduler._counters['rate_limited'] += 1
+        return False
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def estimate_tokens(*texts, completion=500):
+    return sum(len(text) for text in texts if text) // 4 + completion
+
+
+@st.cache_resource
+def get_scheduler():
+    return RequestScheduler(
+        requests_per_minute=st.secrets.get('OPENAI_RPM', 500),
+        tokens_per_minute=st.secrets.get('OPENAI_TPM', 30000),
+        max_retries=st.secrets.get('OPENAI_MAX_RETRIES', 5),
+    )
@@ -0,0 +1,62 @@
+import sys
+
+import pandas as pd
+import streamlit as st
+
+
+def _limit(name, default):
+    return int(st.secrets.get(name, default))
+
+
+def get_draft(review_text):
+    drafts = st.session_state['generated_responses']
+    if review_text not in drafts:
+        return None
+    drafts.move_to_end(review_text)
+    return drafts[review_text]
+
+
+def save_draft(review_text, response):
+    drafts = st.session_state['generated_responses']
+    drafts[review_text] = response
+    drafts.move_to_end(review_text)
+    while len(drafts) > _limit('MAX_RESPONSE_DRAFTS', 50):
+        drafts.popitem(last=False)
+
+
+def append_message(message):
+    messages = st.session_state.messages
+    messages.append(message)
+    # The welcome message is kept, the oldest exchanges after it are dropped
+    overflow = len(messages) - _limit('MAX_CHAT_MESSAGES', 200)
+    if overflow > 0:
+        del messages[1:1 + overflow]
+
+
+def visible_messages():
+    messages = st.session_state.messages
+    window = _limit('CHAT_PAGE_SIZE', 20) * st.session_state.chat_pages
+    hidden = max(0, len(messages) - window)
+    if hidden and st.button(f'Show older messages ({hidden} hidden)', type='tertiary'):
+        st.session_state.chat_pages += 1
+        st.rerun()
+    return messages[hidden:]
+
+
+def _deep_size(value, seen):
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in value)
+    return size
+
+
+def estimate_session_bytes():
+    seen = set()
+    return {key: _deep_size(st.session_state[key], seen) for key in st.session_state}
@@ -0,0 +1,79 @@
+# Usage: python -m scripts.shared_data OUTPUT_DIR  (reads the same secrets as the app)
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import streamlit as st
+
+from pathlib import Path
+
+TABLES = ['locations', 'reviews', 'sentences', 'entities', 'attributes', 'bot']
+MANIFEST = 'manifest.json'
+
+
+def _file_name(name, version):
+    return f'{name}.{version}.arrow'
+
+
+def write_shared(frames, root, keep_versions=2):
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    version = str(time.time_ns())
+    for name, df in frames.items():
+        # Uncompressed so readers can map the buffers instead of decoding them
+        tmp = root / f'.{name}.{version}.arrow'
+        feather.write_feather(df, tmp, compression='uncompressed')
+        os.replace(tmp, root / _file_name(name, version))
+    # Every version has its own files, so swapping the manifest is the only step readers can observe
+    manifest = {
+        'version': version,
+        'written_at': pd.Timestamp.now(tz='UTC').isoformat(),
+        'files': {name: _file_name(name, version) for name in frames},
+        'rows': {name: len(df) for name, df in frames.items()},
+    }
+    tmp = root / f'.{MANIFEST}.{version}'
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, root / MANIFEST)
+
+    # Older versions are removed once replicas had a version in between to move to; open mappings stay valid after unlink
+    versions = sorted({path.name.split('.')[-2] for path in root.glob('*.*.arrow')}, key=int)
+    for old in versions[:-keep_versions]:
+        for path in root.glob(f'*.{old}.arrow'):
+            path.unlink(missing_ok=True)
+    return manifest
+
+
+def read_manifest(root):
+    return json.loads((Path(root) / MANIFEST).read_text())
+
+
+def read_shared(root, name, version):
+    # Unconsolidated blocks let columns keep pointing into the read-only mapping, so replicas share one copy via the page cache
+    table = pa.ipc.open_file(pa.memory_map(str(Path(root) / _file_name(name, version)), 'r')).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2 * len(TABLES))
+def load_shared(root, name, version):
+    return read_shared(root, name, version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the app tables as memory-mappable Arrow files shared by all replicas on a host.')
+    parser.add_argument('output_dir')
+    args = parser.parse_args()
+
+    from scripts.sapi import load_table
+    frames = {name: pd.read_csv(st.secrets[f'{name}_path']) for name in TABLES if name != 'reviews'}
+    frames['reviews'] = load_table(st.secrets['reviews_path'])
+    manifest = write_shared(frames, args.output_dir)
+    print(f"Wrote version {manifest['version']} to {args.output_dir}: "
+          + ', '.join(f'{name} {rows:,}' for name, rows in manifest['rows'].items()))
+
+
+if __name__ == '__main__':
+    main()
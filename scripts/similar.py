@@ -0,0 +1,110 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+import streamlit as st
+
+N_FEATURES = 2 ** 18
+MIN_SIMILARITY = 0.3
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def _features(text):
+    # Hashed unigrams and bigrams with sublinear term frequency
+    words = _TOKEN.findall(str(text).lower())
+    tokens = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+    hashes = np.fromiter((zlib.crc32(token.encode()) % N_FEATURES for token in tokens), dtype=np.int64, count=len(tokens))
+    terms, counts = np.unique(hashes, return_counts=True)
+    return terms, 1 + np.log(counts)
+
+
+class SimilarityIndex:
+    def __init__(self):
+        self.ids, self.texts, self.responses = [], [], []
+        self.positions = {}
+        self._terms, self._weights = [], []
+        self.df = np.zeros(N_FEATURES, dtype=np.int64)
+        self._view = None
+        self._lock = threading.Lock()
+        self.version = None
+
+    def add(self, ids, texts, responses):
+        # New reviews are appended, known ones only get their response replaced
+        with self._lock:
+            for review_id, text, response in zip(ids, texts, responses):
+                position = self.positions.get(review_id)
+                if position is not None:
+                    self.responses[position] = response
+                    continue
+                terms, weights = _features(text)
+                if len(terms) == 0:
+                    continue
+                self.positions[review_id] = len(self.ids)
+                self.ids.append(review_id)
+                self.texts.append(text)
+                self.responses.append(response)
+                self._terms.append(terms)
+                self._weights.append(weights)
+                self.df[terms] += 1
+                self._view = None
+
+    def _inverted(self):
+        # TF-IDF weights sorted by term, rebuilt lazily after documents were added
+        if self._view is None:
+            n = len(self.ids)
+            idf = np.log((1 + n) / (1 + self.df)) + 1
+            docs = np.repeat(np.arange(n), [len(terms) for terms in self._terms])
+            terms = np.concatenate(self._terms)
+            weights = np.concatenate(self._weights) * idf[terms]
+            weights /= np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=n))[docs]
+            order = np.argsort(terms, kind='stable')
+            self._view = (idf, terms[order], docs[order], weights[order])
+        return self._view
+
+    def search(self, text, k=3, exclude=None):
+        with self._lock:
+            if not self.ids:
+                return []
+            idf, terms, docs, weights = self._inverted()
+            query_terms, query_weights = _features(text)
+            query = query_weights * idf[query_terms]
+            if not query.any():
+                return []
+            query /= np.sqrt((query ** 2).sum())
+
+            starts = np.searchsorted(terms, query_terms, side='left')
+            counts = np.searchsorted(terms, query_terms, side='right') - starts
+            postings = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+            scores = np.bincount(docs[postings], weights=weights[postings] * np.repeat(query, counts), minlength=len(self.ids))
+            if exclude in self.positions:
+                scores[self.positions[exclude]] = 0
+
+            top = np.argsort(-scores, kind='stable')[:k]
+            return [
+                {'REVIEW_ID': self.ids[i], 'REVIEW_TEXT': self.texts[i], 'RESPONSE': self.responses[i], 'SIMILARITY': float(scores[i])}
+                for i in top if scores[i] >= MIN_SIMILARITY and self.responses[i]
+            ]
+
+
+@st.cache_resource
+def get_similarity_index(brand):
+    return SimilarityIndex()
+
+
+def sync_responses(index, reviews, version=None, place_ids=None):
+    # Compares every review with a text against the index once per version, so edited and cleared responses are replaced too
+    if version is not None and version == index.version:
+        return
+    if place_ids is not None:
+        reviews = reviews[reviews['PLACE_ID'].isin(place_ids)]
+    reviews = reviews[reviews['REVIEW_TEXT'].notna()]
+    responses = reviews['RESPONSE'].fillna('').astype(str)
+    responses = responses.where(responses.str.strip().ne(''), '')
+    with index._lock:
+        known = dict(zip(index.ids, index.responses))
+    indexed = reviews['REVIEW_ID'].map(known)
+    changed = (indexed.isna() & responses.ne('')) | (indexed.notna() & indexed.ne(responses))
+    if changed.any():
+        index.add(reviews.loc[changed, 'REVIEW_ID'].tolist(), reviews.loc[changed, 'REVIEW_TEXT'].tolist(), responses[changed].tolist())
+    index.version = version
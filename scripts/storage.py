@@ -0,0 +1,97 @@
+# Usage: python -m scripts.storage LOCATIONS_CSV REVIEWS_CSV OUTPUT_DIR [--no-months]
+import argparse
+import json
+import pandas as pd
+import pyarrow.dataset as ds
+import streamlit as st
+
+from pathlib import Path
+
+BRANDS = 'brands.json'
+RELATIVE_RANGES = {
+    'Last Week': pd.DateOffset(weeks=1),
+    'Last Month': pd.DateOffset(months=1),
+    'Last 3 Months': pd.DateOffset(months=3),
+}
+
+
+def build_partitions(locations, reviews, root, by_month=True):
+    root = Path(root)
+    locations = locations.copy()
+    locations['BRAND'] = locations['BRAND'].astype(str)
+    locations.to_parquet(root / 'locations', partition_cols=['BRAND'], index=False, existing_data_behavior='delete_matching')
+    # Partition directories come back sorted, so the source order of the brands is kept next to them
+    (root / BRANDS).write_text(json.dumps(locations['BRAND'].unique().tolist()))
+
+    reviews = reviews.merge(locations[['PLACE_ID', 'BRAND']], on='PLACE_ID', how='inner')
+    partition_cols = ['BRAND']
+    if by_month:
+        reviews['REVIEW_MONTH'] = pd.to_datetime(reviews['REVIEW_DATE']).dt.strftime('%Y-%m')
+        partition_cols.append('REVIEW_MONTH')
+    reviews.to_parquet(root / 'reviews', partition_cols=partition_cols, index=False, existing_data_behavior='delete_matching')
+
+
+def pushdown_range(date_selection, today=None):
+    # Only relative ranges are known before the data is read, the others need the full date span
+    if date_selection not in RELATIVE_RANGES:
+        return None, None
+    # Whole days only, so the range stays the same cache key for every rerun of the day
+    end = pd.to_datetime(today or 'today').normalize()
+    return end - RELATIVE_RANGES[date_selection], end
+
+
+@st.cache_data(show_spinner=False)
+def list_brands(root):
+    # Same order as the brand selectbox in CSV mode, so both default to the same brand
+    path = Path(root) / BRANDS
+    if path.exists():
+        return json.loads(path.read_text())
+    # Stores written before the order was kept: only the partition key is read, straight from the directory names
+    brands = pd.read_parquet(Path(root) / 'locations', columns=['BRAND'])['BRAND']
+    return sorted(brands.astype(str).unique().tolist())
+
+
+@st.cache_data(show_spinner=False)
+def partitioned_by_month(root):
+    return 'REVIEW_MONTH' in ds.dataset(Path(root) / 'reviews', partitioning='hive').schema.names
+
+
+@st.cache_data(show_spinner='Loading data...🍟🍔🧋')
+def load_locations(root, brand):
+    locations = pd.read_parquet(Path(root) / 'locations', filters=[('BRAND', '==', brand)])
+    locations['BRAND'] = locations['BRAND'].astype(str)
+    return locations
+
+
+@st.cache_data(show_spinner='Loading data...🍟🍔🧋', max_entries=16)
+def load_reviews(root, brand, start=None, end=None, columns=None):
+    path = Path(root) / 'reviews'
+    filters = [('BRAND', '==', brand)]
+    by_month = partitioned_by_month(root)
+    if by_month and start is not None:
+        filters.append(('REVIEW_MONTH', '>=', start.strftime('%Y-%m')))
+    if by_month and end is not None:
+        filters.append(('REVIEW_MONTH', '<=', end.strftime('%Y-%m')))
+    if columns is not None:
+        columns = list(columns)
+    reviews = pd.read_parquet(path, filters=filters, columns=columns)
+    # Partition keys were not part of the source table
+    return reviews.drop(columns=['BRAND', 'REVIEW_MONTH'], errors='ignore')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write locations and reviews as brand (and month) partitioned Parquet.')
+    parser.add_argument('locations_csv')
+    parser.add_argument('reviews_csv')
+    parser.add_argument('output_dir')
+    parser.add_argument('--no-months', action='store_true', help='partition reviews by brand only')
+    args = parser.parse_args()
+
+    locations = pd.read_csv(args.locations_csv)
+    reviews = pd.read_csv(args.reviews_csv)
+    build_partitions(locations, reviews, args.output_dir, by_month=not args.no_months)
+    print(f"Wrote {len(locations):,} locations and {len(reviews):,} reviews to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import pandas as pd
+import streamlit as st
+
+from pathlib import Path
+
+from scripts.backend import get_connection
+
+SENTIMENTS = ['Positive', 'Mixed', 'Negative', 'Unknown']
+
+
+def brand_summary(locations, reviews):
+    # One row per brand with the headline totals and the rating and sentiment counts behind them
+    reviews = reviews[['PLACE_ID', 'RATING', 'OVERALL_SENTIMENT']].merge(locations[['PLACE_ID', 'BRAND']], on='PLACE_ID', how='inner')
+    totals = reviews.groupby('BRAND').agg(REVIEW_COUNT=('PLACE_ID', 'size'), RATING_SUM=('RATING', 'sum'), RATING_COUNT=('RATING', 'count'))
+    ratings = pd.crosstab(reviews['BRAND'], reviews['RATING'].astype('Int64'))
+    sentiments = pd.crosstab(reviews['BRAND'], reviews['OVERALL_SENTIMENT'])
+    return _assemble(locations, totals, ratings, sentiments)
+
+
+def _assemble(locations, totals, ratings, sentiments):
+    summary = locations.groupby('BRAND').agg(LOCATION_COUNT=('PLACE_ID', 'size'), DATA_COLLECTED_AT=('DATA_COLLECTED_AT', 'max'))
+    ratings = ratings.add_prefix('RATING_')
+    sentiments = sentiments.reindex(columns=SENTIMENTS + sorted(set(sentiments.columns) - set(SENTIMENTS)), fill_value=0).add_prefix('SENTIMENT_')
+
+    # Brands without reviews keep their row with zero counts
+    summary = summary.join([totals, ratings, sentiments])
+    summary['RATING_SUM'] = summary['RATING_SUM'].fillna(0)
+    count_columns = ['REVIEW_COUNT', 'RATING_COUNT'] + list(ratings.columns) + list(sentiments.columns)
+    summary[count_columns] = summary[count_columns].fillna(0).astype('int64')
+    summary['AVG_RATING'] = (summary['RATING_SUM'] / summary['RATING_COUNT'].where(summary['RATING_COUNT'] > 0)).round(2)
+    summary.index = summary.index.astype(str)
+    return summary
+
+
+def store_summary_sql(root):
+    # The same summary from three GROUP BY queries over the store, so no review rows are materialized
+    source = (Path(root) / 'reviews' / '**' / '*.parquet').as_posix()
+    reviews = f"read_parquet('{source}', hive_partitioning = true)"
+    cursor = get_connection().cursor()
+    try:
+        totals = cursor.execute(
+            f'SELECT BRAND, COUNT(*) AS REVIEW_COUNT, SUM(RATING) AS RATING_SUM, COUNT(RATING) AS RATING_COUNT '
+            f'FROM {reviews} GROUP BY BRAND').df()
+        ratings = cursor.execute(
+            f'SELECT BRAND, CAST(RATING AS BIGINT) AS RATING, COUNT(*) AS N FROM {reviews} '
+            f'WHERE RATING IS NOT NULL GROUP BY ALL').df()
+        sentiments = cursor.execute(
+            f'SELECT BRAND, OVERALL_SENTIMENT, COUNT(*) AS N FROM {reviews} '
+            f'WHERE OVERALL_SENTIMENT IS NOT NULL GROUP BY ALL').df()
+    finally:
+        cursor.close()
+    locations = pd.read_parquet(Path(root) / 'locations', columns=['PLACE_ID', 'BRAND', 'DATA_COLLECTED_AT'])
+    locations['BRAND'] = locations['BRAND'].astype(str)
+    for frame in (totals, ratings, sentiments):
+        frame['BRAND'] = frame['BRAND'].astype(str)
+    return _assemble(
+        locations,
+        totals.set_index('BRAND'),
+        ratings.pivot(index='BRAND', columns='RATING', values='N').fillna(0).sort_index(axis=1),
+        sentiments.pivot(index='BRAND', columns='OVERALL_SENTIMENT', values='N').fillna(0))
+
+
+def sentiment_counts(summary):
+    # Same shape as value_counts() on the brand's OVERALL_SENTIMENT column
+    counts = summary.filter(like='SENTIMENT_')
+    counts.index = counts.index.str.removeprefix('SENTIMENT_')
+    return counts[counts > 0].astype('int64').sort_values(ascending=False)
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def get_brand_summary(_locations, _reviews, version):
+    # Keyed by the data version instead of hashing the frames, so a rerun only pays for the lookup
+    return brand_summary(_locations, _reviews)
+
+
+@st.cache_data(show_spinner=False)
+def load_store_summary(root, sql=False):
+    # Built once per partitioned store, by DuckDB when the SQL backend is on, otherwise from the three review columns it needs
+    if sql:
+        return store_summary_sql(root)
+    locations = pd.read_parquet(Path(root) / 'locations', columns=['PLACE_ID', 'BRAND', 'DATA_COLLECTED_AT'])
+    locations['BRAND'] = locations['BRAND'].astype(str)
+    reviews = pd.read_parquet(Path(root) / 'reviews', columns=['PLACE_ID', 'RATING', 'OVERALL_SENTIMENT'])
+    return brand_summary(locations, reviews)
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 
+from scripts.export import export_button
 from scripts.openai import generate_response
 from scripts.sapi import write_table
+from scripts.session import get_draft, save_draft
+from scripts.similar import get_similarity_index, sync_responses
+from scripts.timing import timed
 
 def sentiment_color(val):
     color_map = {
@@ -14,8 +18,12 @@ def sentiment_color(val):
     return color_map.get(val, '')
 
 
-def support(data, reviews_data):
+@timed('tab.support')
+def support(data, reviews_data, sentences, entities, brand, brand_place_ids, version=None):
     st.markdown("<br>", unsafe_allow_html=True)
+    # Suggestions only ever come from responses to the same brand
+    similarity_index = get_similarity_index(brand)
+    sync_responses(similarity_index, reviews_data, version, brand_place_ids)
     filtered_review_data_detailed = data[data['REVIEW_TEXT'].notna()].sort_values('REVIEW_DATE', ascending=False)
     if filtered_review_data_detailed.empty:
         st.info('No reviews with feedback text available for the selected filters.', icon=':material/info:')
@@ -65,6 +73,7 @@ def support(data, reviews_data):
         use_container_width=True, 
         hide_index=True
     )
+    export_button(df_to_edit.drop(columns='SELECT'), 'support_reviews', sentences=sentences, entities=entities, key='support_export')
     
     selected_sum = df_to_edit['SELECT'].sum()
 
@@ -90,21 +99,33 @@ Author: {author_name}
             col1, col2 = st.columns(2)
             placeholder = col2.empty()
 
+            # Routine reviews can start from a response already written for a similar one
+            similar_reviews = similarity_index.search(review_text, k=3, exclude=selected_review['REVIEW_ID'])
+            if similar_reviews:
+                with st.expander(f'♻️ Similar reviews with a saved response ({len(similar_reviews)})', expanded=get_draft(review_text) is None):
+                    for similar in similar_reviews:
+                        st.caption(f"_{similar['SIMILARITY']:.0%} similar:_ {similar['REVIEW_TEXT']}")
+                        col1, col2 = st.columns([0.8, 0.2], vertical_alignment='center')
+                        col1.write(similar['RESPONSE'])
+                        if col2.button('Use as draft', key=f"template_{similar['REVIEW_ID']}", use_container_width=True):
+                            save_draft(review_text, similar['RESPONSE'])
+                            st.rerun()
+
         if placeholder.button('💬 Generate Response', use_container_width=True):
-            if review_text in st.session_state['generated_responses']:
-                response = st.session_state['generated_responses'][review_text]
-            else:
+            response = get_draft(review_text)
+            if response is None:
                 with st.spinner(':robot_face: Generating response, please wait...'):
                     response = generate_response(prompt)
                 if response:
-                    st.session_state['generated_responses'][review_text] = response
+                    save_draft(review_text, response)
                 else:
                     response = ''
 
-        if review_text in st.session_state['generated_responses']:
+        draft = get_draft(review_text)
+        if draft is not None:
             with col9:
                 st.write(f'**Response Draft**')
-                edited_response = st.text_area("Response Draft", st.session_state['generated_responses'][review_text], label_visibility='collapsed', height=170)
+                edited_response = st.text_area("Response Draft", draft, label_visibility='collapsed', height=170)
                 col1, col2, col3 = st.columns(3)
                 
                 if col3.button('🔄 Regenerate', use_container_width=True):
@@ -122,7 +143,7 @@ Author: {author_name}
 Original task:
 {prompt}
 
-Previous response: {st.session_state['generated_responses'][review_text]}
+Previous response: {draft}
 
 Additional instruction: {instruction}
 
@@ -130,7 +151,7 @@ Please provide an updated response incorporating the additional instruction.
 """
                             response = generate_response(new_prompt)
                             if response:
-                                st.session_state['generated_responses'][review_text] = response
+                                save_draft(review_text, response)
                                 st.session_state.regenerate_clicked = False
                                 st.session_state.instruction = ''
                                 st.rerun()
@@ -151,14 +172,17 @@ Please provide an updated response incorporating the additional instruction.
                         update_df['STATUS'] = update_df['STATUS'].astype(str)
                         update_df['CUSTOMER_SUCCESS_NOTES'] = update_df['CUSTOMER_SUCCESS_NOTES'].astype(str)
                         
-                        reviews_data.loc[reviews_data['REVIEW_ID'] == review_id, ['RESPONSE', 'STATUS', 'CUSTOMER_SUCCESS_NOTES']] = [
+                        # The reviews snapshot is shared between sessions, so only the copied row is edited
+                        review_row = reviews_data[reviews_data['REVIEW_ID'] == review_id].copy()
+                        review_row[['RESPONSE', 'STATUS', 'CUSTOMER_SUCCESS_NOTES']] = [
                             update_df['RESPONSE'].iloc[0],
                             update_df['STATUS'].iloc[0], 
                             update_df['CUSTOMER_SUCCESS_NOTES'].iloc[0]
                         ]
                         
-                        update_df = reviews_data[reviews_data['REVIEW_ID'] == review_id].copy()
+                        update_df = review_row
                         write_table('in.c-whataburger-demo.REVIEWS', update_df, is_incremental=True)
+                        similarity_index.add([review_id], [review_text], [edited_response])
                         st.success('Response saved successfully!')
                     except Exception as e:
                         st.error(f'Failed to save response: {str(e)}')
@@ -0,0 +1,194 @@
+# Usage: python -m scripts.synthetic OUTPUT_DIR --locations 200 --reviews-per-location 250
+import argparse
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+BRANDS = ['Whataburger', 'Burger Barn']
+CITIES = [
+    ('TX', 'Texas', 'Houston', 29.76, -95.37), ('TX', 'Texas', 'Austin', 30.27, -97.74), ('TX', 'Texas', 'Dallas', 32.78, -96.80),
+    ('TX', 'Texas', 'San Antonio', 29.42, -98.49), ('OK', 'Oklahoma', 'Tulsa', 36.15, -95.99), ('OK', 'Oklahoma', 'Oklahoma City', 35.47, -97.52),
+    ('AZ', 'Arizona', 'Phoenix', 33.45, -112.07), ('NM', 'New Mexico', 'Albuquerque', 35.08, -106.65), ('FL', 'Florida', 'Pensacola', 30.42, -87.22),
+    ('AL', 'Alabama', 'Mobile', 30.69, -88.04), ('LA', 'Louisiana', 'Shreveport', 32.53, -93.75), ('AR', 'Arkansas', 'Little Rock', 34.75, -92.29),
+]
+STREETS = ['Main St', 'Oak Ave', 'Highway 6', 'Elm St', 'Park Blvd', 'Lamar Blvd', 'Broadway', 'Cedar Rd', 'Mesa Dr', 'Lake Rd']
+SENTIMENT_BY_RATING = {1: 'Negative', 2: 'Negative', 3: 'Mixed', 4: 'Positive', 5: 'Positive'}
+RATING_WEIGHTS = [0.14, 0.06, 0.09, 0.16, 0.55]
+CATEGORIES = {
+    'Food': {'Quality': ['Taste', 'Temperature', 'Freshness'], 'Menu': ['Variety', 'Portion Size']},
+    'People': {'Team': ['Hospitality', 'Attentiveness'], 'Management': ['Complaint Handling']},
+    'Experience': {'Ordering': ['Pricing Accuracy', 'Order Accuracy', 'Wait Time'], 'Atmosphere': ['Cleanliness', 'Noise']},
+}
+ENTITIES = ['burger', 'fries', 'shake', 'drive-thru', 'staff', 'onion rings', 'chicken', 'order', 'manager', 'bun', 'ketchup', 'coffee']
+ATTRIBUTES = ['hot', 'cold', 'fresh', 'slow', 'friendly', 'rude', 'crispy', 'soggy', 'great', 'wrong', 'clean', 'delicious']
+PHRASES = {
+    'Positive': ['The {e} was great and the staff were friendly.', 'Loved the {e}, always fresh and hot.', 'Fast service and a delicious {e}.'],
+    'Mixed': ['The {e} was fine but the wait was long.', 'Decent {e}, the order took a while.', 'Good {e} but the place was not clean.'],
+    'Negative': ['My order was wrong and the {e} was cold.', 'Long wait at the drive-thru and soggy {e}.', 'Rude staff and the {e} was missing.'],
+}
+MEAL_TYPES = ['Breakfast', 'Lunch', 'Dinner', 'Other']
+SERVICES = ['Drive-thru', 'Dine in', 'Take out', 'Delivery']
+STATUSES = ['🌱 New', '✔️ Resolved', '🚫 Spam']
+
+SCALES = {
+    'small': {'locations': 50, 'reviews_per_location': 40},
+    'medium': {'locations': 200, 'reviews_per_location': 100},
+    'large': {'locations': 500, 'reviews_per_location': 400},
+}
+
+
+def generate_locations(n_locations, rng, collected_at):
+    city_index = rng.integers(0, len(CITIES), n_locations)
+    cities = [CITIES[i] for i in city_index]
+    place_ids = [f'ChIJ{i:08d}' for i in range(n_locations)]
+    return pd.DataFrame({
+        'PLACE_ID': place_ids,
+        'BRAND': np.where(np.arange(n_locations) % 5 == 4, BRANDS[1], BRANDS[0]),
+        'STATE': [c[0] for c in cities],
+        'CITY': [c[2] for c in cities],
+        'ADDRESS': [f'{rng.integers(100, 9999)} {STREETS[i % len(STREETS)]}, {c[2]}, {c[0]}' for i, c in enumerate(cities)],
+        'POSTAL_CODE': rng.integers(70000, 89999, n_locations).astype(str),
+        'LATITUDE': np.round([c[3] for c in cities] + rng.normal(0, 0.15, n_locations), 6),
+        'LONGITUDE': np.round([c[4] for c in cities] + rng.normal(0, 0.15, n_locations), 6),
+        'PLACE_TOTAL_SCORE': np.round(rng.uniform(3.2, 4.8, n_locations), 1),
+        'PLACE_URL': [f'https://maps.example.com/place/{p}' for p in place_ids],
+        'DATA_COLLECTED_AT': collected_at.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+
+
+def generate_reviews(locations, reviews_per_location, rng, end_date, days=730):
+    n_reviews = len(locations) * reviews_per_location
+    place_index = rng.integers(0, len(locations), n_reviews)
+    ratings = rng.choice(np.arange(1, 6), size=n_reviews, p=RATING_WEIGHTS)
+    sentiments = pd.Series(ratings).map(SENTIMENT_BY_RATING).to_numpy()
+    sentiments[rng.random(n_reviews) < 0.03] = 'Unknown'
+    review_dates = end_date - pd.to_timedelta(rng.integers(0, days * 24 * 60, n_reviews), unit='min')
+    entity_index = rng.integers(0, len(ENTITIES), n_reviews)
+    phrase_index = rng.integers(0, 3, n_reviews)
+    texts = [
+        PHRASES.get(s, PHRASES['Mixed'])[p].format(e=ENTITIES[e])
+        for s, p, e in zip(sentiments, phrase_index, entity_index)
+    ]
+    texts = pd.Series(texts, dtype=object)
+    texts[rng.random(n_reviews) < 0.3] = None
+    review_ids = [f'R{i:010d}' for i in range(n_reviews)]
+
+    def detailed(offset):
+        values = np.clip(ratings + rng.integers(-1, 2, n_reviews) + offset, 1, 5).astype(float)
+        values[rng.random(n_reviews) < 0.4] = np.nan
+        return values
+
+    responded = rng.random(n_reviews) < 0.2
+    return pd.DataFrame({
+        'PLACE_ID': locations['PLACE_ID'].to_numpy()[place_index],
+        'REVIEW_ID': review_ids,
+        'FEEDBACK_CHANNEL': 'Google',
+        'REVIEWER_NAME': [f'Guest {i % 9973}' for i in range(n_reviews)],
+        'REVIEW_DATE': review_dates.strftime('%Y-%m-%d %H:%M:%S'),
+        'RATING': ratings,
+        'REVIEW_TEXT': texts,
+        'OVERALL_SENTIMENT': sentiments,
+        'REVIEW_CONTEXT_MEAL_TYPE': rng.choice(MEAL_TYPES, n_reviews),
+        'REVIEW_CONTEXT_SERVICE': rng.choice(SERVICES, n_reviews),
+        'REVIEW_DETAILED_FOOD': detailed(0),
+        'REVIEW_DETAILED_SERVICE': detailed(-0.3),
+        'REVIEW_DETAILED_ATMOSPHERE': detailed(0.2),
+        'REVIEW_URL': [f'https://maps.example.com/review/{r}' for r in review_ids],
+        'STATUS': np.where(responded, STATUSES[1], STATUSES[0]),
+        'RESPONSE': np.where(responded, 'Thank you for your feedback!', None),
+        'CUSTOMER_SUCCESS_NOTES': None,
+    })
+
+
+def generate_sentences(reviews, rng, sentences_per_review=2):
+    with_text = reviews[reviews['REVIEW_TEXT'].notna()]
+    review_ids = np.repeat(with_text['REVIEW_ID'].to_numpy(), sentences_per_review)
+    sentiments = np.repeat(with_text['OVERALL_SENTIMENT'].to_numpy(), sentences_per_review)
+    topics = [(c, g, t) for c, groups in CATEGORIES.items() for g, ts in groups.items() for t in ts]
+    topic_index = rng.integers(0, len(topics), len(review_ids))
+    return pd.DataFrame({
+        'SENTENCE_ID': [f'S{i:011d}' for i in range(len(review_ids))],
+        'REVIEW_ID': review_ids,
+        'CATEGORY': [topics[i][0] for i in topic_index],
+        'CATEGORY_GROUP': [topics[i][1] for i in topic_index],
+        'TOPIC': [topics[i][2] for i in topic_index],
+        'SENTENCE_SENTIMENT': np.where(sentiments == 'Unknown', 'Mixed', sentiments),
+    })
+
+
+def generate_entities(sentences, rng):
+    has_entity = rng.random(len(sentences)) < 0.8
+    mentioned = sentences[has_entity]
+    return pd.DataFrame({
+        'SENTENCE_ID': mentioned['SENTENCE_ID'].to_numpy(),
+        'REVIEW_ID': mentioned['REVIEW_ID'].to_numpy(),
+        'ENTITY': rng.choice(ENTITIES, len(mentioned)),
+    })
+
+
+def generate_attributes(entities, rng):
+    pairs = pd.DataFrame({
+        'entity': entities['ENTITY'].to_numpy(),
+        'attribute': rng.choice(ATTRIBUTES, len(entities)),
+    })
+    # Keep the raw quirks the dashboard normalizes away
+    pairs.loc[pairs.sample(frac=0.02, random_state=0).index, 'entity'] = 'burgers'
+    pairs.loc[pairs.sample(frac=0.01, random_state=1).index, 'entity'] = 'it'
+    return pairs.groupby(['entity', 'attribute']).size().reset_index(name='count')
+
+
+def generate_bot_data(locations, reviews):
+    place_reviews = reviews.groupby('PLACE_ID').size().rename('PLACE_REVIEWS_COUNT').reset_index()
+    bot = reviews.merge(locations, on='PLACE_ID', how='inner').merge(place_reviews, on='PLACE_ID', how='left')
+    columns = ['REVIEW_ID', 'FEEDBACK_CHANNEL', 'PLACE_ID', 'PLACE_TOTAL_SCORE', 'PLACE_REVIEWS_COUNT', 'LATITUDE', 'LONGITUDE',
+               'REVIEWER_NAME', 'REVIEW_DATE', 'RATING', 'REVIEW_CONTEXT_MEAL_TYPE', 'REVIEW_CONTEXT_SERVICE',
+               'REVIEW_DETAILED_FOOD', 'REVIEW_DETAILED_SERVICE', 'REVIEW_DETAILED_ATMOSPHERE', 'REVIEW_TEXT',
+               'OVERALL_SENTIMENT', 'CITY', 'STATE', 'POSTAL_CODE']
+    return bot[columns]
+
+
+def generate_dataset(n_locations, reviews_per_location, seed=42, end_date=None):
+    rng = np.random.default_rng(seed)
+    end_date = pd.Timestamp(end_date) if end_date is not None else pd.Timestamp.today().normalize()
+    locations = generate_locations(n_locations, rng, end_date)
+    reviews = generate_reviews(locations, reviews_per_location, rng, end_date)
+    sentences = generate_sentences(reviews, rng)
+    entities = generate_entities(sentences, rng)
+    return {
+        'locations': locations.drop(columns=['POSTAL_CODE']),
+        'reviews': reviews.drop(columns=['FEEDBACK_CHANNEL', 'REVIEW_CONTEXT_MEAL_TYPE', 'REVIEW_CONTEXT_SERVICE']),
+        'sentences': sentences,
+        'entities': entities,
+        'attributes': generate_attributes(entities, rng),
+        'bot': generate_bot_data(locations, reviews),
+    }
+
+
+def write_dataset(output_dir, n_locations, reviews_per_location, seed=42, end_date=None):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for name, df in generate_dataset(n_locations, reviews_per_location, seed, end_date).items():
+        paths[name] = output_dir / f'{name}.csv'
+        df.to_csv(paths[name], index=False)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic QSR dataset matching the dashboard schemas.')
+    parser.add_argument('output_dir')
+    parser.add_argument('--scale', choices=SCALES, help='preset size, overrides --locations and --reviews-per-location')
+    parser.add_argument('--locations', type=int, default=200)
+    parser.add_argument('--reviews-per-location', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    size = SCALES[args.scale] if args.scale else {'locations': args.locations, 'reviews_per_location': args.reviews_per_location}
+    paths = write_dataset(args.output_dir, size['locations'], size['reviews_per_location'], seed=args.seed)
+    for name, path in paths.items():
+        print(f'{name:<10} {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import logging
+import queue
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPool:
+    def __init__(self, create, size=3, retry_delay=30):
+        self.size = size
+        self.retry_delay = retry_delay
+        self._create = create
+        self._ready = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._tasks = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='assistant-thread-pool', daemon=True)
+        self._worker.start()
+        self._wake.set()
+
+    def take(self):
+        with self._lock:
+            thread_id = self._ready.popleft() if self._ready else None
+        self._wake.set()
+        if thread_id is None:
+            # Pool drained, fall back to creating the thread on the request path
+            thread_id = self._create(background=False)
+        return thread_id
+
+    def defer(self, fn, *args, **kwargs):
+        # The future hands the result or the error back to the session, which renders it on its own thread
+        future = Future()
+        self._tasks.put((future, fn, args, kwargs))
+        self._wake.set()
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {'ready': len(self._ready), 'size': self.size, 'pending_tasks': self._tasks.qsize()}
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=self.retry_delay)
+            self._wake.clear()
+            self._drain_tasks()
+            self._refill()
+
+    def _drain_tasks(self):
+        while True:
+            try:
+                future, fn, args, kwargs = self._tasks.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                logger.exception('Deferred assistant task failed')
+                future.set_exception(e)
+
+    def _refill(self):
+        while True:
+            with self._lock:
+                if len(self._ready) >= self.size:
+                    return
+            try:
+                thread_id = self._create(background=True)
+            except Exception:
+                logger.exception('Pre-creating an assistant thread failed')
+                time.sleep(1)
+                return
+            with self._lock:
+                self._ready.append(thread_id)
+            self._drain_tasks()
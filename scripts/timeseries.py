@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Longest range shown per day/week before moving to a coarser resolution
+MAX_PERIODS = 400
+# Line series are thinned to this many points per trace
+MAX_LINE_POINTS = 300
+# Charts with more points than this are drawn with WebGL
+WEBGL_POINTS = 500
+# Fixed length of the per-location rating sparklines
+SPARKLINE_POINTS = 26
+
+RATING_BINS = [1.5, 2.5, 3.6, 4.5]
+RATING_BIN_COLORS = np.array(['#EA4335', '#e98f41', '#FBBC05', '#a5c553', '#34A853'])
+
+
+def choose_resolution(start, end, max_periods=MAX_PERIODS):
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    if days <= max_periods:
+        return 'Day'
+    if days / 7 <= max_periods:
+        return 'Week'
+    return 'Month'
+
+
+def period_start(dates, resolution):
+    dates = pd.to_datetime(dates)
+    if resolution == 'Day':
+        return dates.dt.normalize()
+    return dates.dt.to_period('W' if resolution == 'Week' else 'M').dt.start_time
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: positions of the points that best keep the shape of the line
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i < threshold - 3 else (n - 1, n)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(df, x, y, max_points=MAX_LINE_POINTS):
+    df = df.dropna(subset=[y]).sort_values(x)
+    keep = lttb(pd.to_datetime(df[x]).astype('int64'), df[y], max_points)
+    return df.iloc[keep]
+
+
+def render_mode(points):
+    return 'webgl' if points > WEBGL_POINTS else 'svg'
+
+
+def rating_color(values):
+    return RATING_BIN_COLORS[np.searchsorted(RATING_BINS, np.asarray(values, dtype=float), side='right')].tolist()
+
+
+def rating_sparklines(data, max_points=SPARKLINE_POINTS):
+    # Mean rating per location over equal time bins, weekly unless the range is longer than max_points weeks
+    dates = pd.to_datetime(data['REVIEW_DATE'])
+    start, end = dates.min(), dates.max() + pd.Timedelta(days=1)
+    bins = int(np.clip((end - start).days // 7, 1, max_points))
+    codes = ((dates - start) / (end - start) * bins).astype(int).rename('BIN')
+    means = data['RATING'].groupby([data['PLACE_ID'], codes]).mean().unstack().reindex(columns=range(bins))
+    # Weeks without reviews carry the previous value so every row has the same length
+    means = means.ffill(axis=1).bfill(axis=1).round(2)
+    return pd.Series(means.values.tolist(), index=means.index)
@@ -0,0 +1,132 @@
+import functools
+import json
+import os
+import socket
+import threading
+import time
+
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+_local = threading.local()
+_lock = threading.Lock()
+_durations = defaultdict(lambda: deque(maxlen=1000))
+_gauges = {}
+REPLICA = f'{socket.gethostname()}:{os.getpid()}'
+
+
+def start_rerun():
+    _local.spans = []
+    _local.gauges = {}
+    _local.started_at = time.perf_counter()
+
+
+@contextmanager
+def span(name):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started_at)
+
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name, seconds):
+    with _lock:
+        _durations[name].append(seconds)
+    # Spans from background threads only feed the process-wide percentiles
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+    gauges = getattr(_local, 'gauges', None)
+    if gauges is not None:
+        gauges[name] = value
+
+
+def percentiles():
+    with _lock:
+        snapshot = {name: sorted(values) for name, values in _durations.items()}
+    return {
+        name: {
+            'count': len(values),
+            'p50_ms': round(values[len(values) // 2] * 1000, 2),
+            'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 2),
+        }
+        for name, values in snapshot.items() if values
+    }
+
+
+def _rerun_breakdown():
+    totals = defaultdict(lambda: [0, 0.0])
+    for name, seconds in getattr(_local, 'spans', []):
+        totals[name][0] += 1
+        totals[name][1] += seconds
+    return {name: {'calls': calls, 'ms': round(seconds * 1000, 2)} for name, (calls, seconds) in totals.items()}
+
+
+def _log_path():
+    return os.environ.get('QSR_TIMING_LOG') or st.secrets.get('TIMING_LOG')
+
+
+def _debug_enabled():
+    # The deployment has to allow the panel, ?debug=1 then opens it for that session only
+    allowed = os.environ.get('QSR_DEBUG_PANEL') or st.secrets.get('DEBUG_PANEL', False)
+    return bool(allowed) and st.query_params.get('debug') == '1'
+
+
+def sink_enabled():
+    # Gauges that are costly to compute are only worth it when something will show or store them
+    return bool(_log_path()) or bool(_debug_enabled())
+
+
+def finish_rerun(**context):
+    if getattr(_local, 'spans', None) is None:
+        return
+    total_ms = round((time.perf_counter() - _local.started_at) * 1000, 2)
+    breakdown = _rerun_breakdown()
+
+    path = _log_path()
+    if path:
+        line = {
+            'ts': time.time(),
+            'replica': REPLICA,
+            'total_ms': total_ms,
+            'spans': breakdown,
+            'gauges': dict(_local.gauges),
+            'stats': percentiles(),
+            **context,
+        }
+        with _lock, open(path, 'a') as f:
+            f.write(json.dumps(line, default=str) + '\n')
+
+    if _debug_enabled():
+        stats = percentiles()
+        with st.sidebar.expander('⏱️ Timing', expanded=False):
+            st.caption(f'**This rerun:** {total_ms:,.0f} ms on {REPLICA}')
+            st.dataframe(
+                [{'Span': name, 'Calls': v['calls'], 'ms': v['ms'],
+                  'p50 ms': stats.get(name, {}).get('p50_ms'), 'p95 ms': stats.get(name, {}).get('p95_ms')}
+                 for name, v in sorted(breakdown.items(), key=lambda item: -item[1]['ms'])],
+                hide_index=True,
+            )
+            with _lock:
+                gauges = {**_gauges, **_local.gauges}
+            if gauges:
+                st.json(gauges, expanded=False)
+    _local.spans = None
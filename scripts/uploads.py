@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FILENAME_PREFIX = 'qsr-slice-'
+
+
+def content_hash(df):
+    digest = hashlib.sha256(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()[:32]
+
+
+class UploadCache:
+    def __init__(self, client, scheduler, max_files=50, lease_minutes=60):
+        self.client = client
+        self.scheduler = scheduler
+        self.max_files = max_files
+        self.lease = lease_minutes * 60
+        self._files = OrderedDict()
+        # Files uploaded or adopted by this cache are deleted on eviction
+        self._owned = set()
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._uploading = {}
+        threading.Thread(target=self._sync_remote, name='assistant-upload-cleanup', daemon=True).start()
+
+    def file_for(self, df):
+        digest = content_hash(df)
+        with self._lock:
+            file_id = self._files.get(digest)
+            if file_id is not None:
+                self._files.move_to_end(digest)
+                self._last_used[file_id] = time.time()
+                return file_id
+            # Concurrent sessions with the same selection wait for a single upload
+            event = self._uploading.get(digest)
+            owner = event is None
+            if owner:
+                event = self._uploading[digest] = threading.Event()
+        if not owner:
+            event.wait()
+            with self._lock:
+                file_id = self._files.get(digest)
+            if file_id is not None:
+                return file_id
+            return self.file_for(df)
+
+        try:
+            file_id = self._upload(df, digest)
+        finally:
+            with self._lock:
+                self._uploading.pop(digest, None)
+            event.set()
+        with self._lock:
+            self._files[digest] = file_id
+            self._owned.add(file_id)
+            self._last_used[file_id] = time.time()
+            evicted = self._evict()
+        for stale_id in evicted:
+            self._delete(stale_id)
+        return file_id
+
+    def touch(self, file_id):
+        # Called while a session's thread has the file attached, so it is not evicted under the thread
+        with self._lock:
+            if file_id in self._last_used:
+                self._last_used[file_id] = time.time()
+
+    def _evict(self):
+        # Least recently used first, skipping files still leased by a live thread
+        now = time.time()
+        evicted = []
+        for digest, file_id in list(self._files.items()):
+            if len(self._files) <= self.max_files:
+                break
+            if now - self._last_used.get(file_id, 0) < self.lease:
+                continue
+            del self._files[digest]
+            self._last_used.pop(file_id, None)
+            if file_id in self._owned:
+                self._owned.discard(file_id)
+                evicted.append(file_id)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            return {'files': len(self._files), 'max_files': self.max_files, 'uploading': len(self._uploading)}
+
+    def _upload(self, df, digest):
+        data = df.to_csv(index=False).encode('utf-8')
+        uploaded = self.scheduler.submit(
+            self.client.files.create,
+            file=(f'{FILENAME_PREFIX}{digest}.csv', data),
+            purpose='assistants',
+        )
+        return uploaded.id
+
+    def _delete(self, file_id):
+        try:
+            self.scheduler.submit(self.client.files.delete, file_id)
+        except Exception:
+            logger.exception('Deleting assistant file %s failed', file_id)
+
+    def _sync_remote(self):
+        # Adopts the newest slices uploaded by earlier processes and deletes the ones that no longer fit in the cache.
+        # A slice younger than the lease may still be attached to another replica's thread, so it is only forgotten
+        try:
+            files = self.scheduler.submit(self.client.files.list, purpose='assistants')
+            known = [
+                (file.created_at, file.filename[len(FILENAME_PREFIX):].rsplit('.', 1)[0], file.id)
+                for file in files if file.filename and file.filename.startswith(FILENAME_PREFIX)
+            ]
+            stale = []
+            now = time.time()
+            with self._lock:
+                for created_at, digest, file_id in sorted(known, reverse=True):
+                    if file_id in self._owned:
+                        continue
+                    if digest not in self._files and len(self._files) < self.max_files:
+                        self._files[digest] = file_id
+                        self._files.move_to_end(digest, last=False)
+                        self._owned.add(file_id)
+                        self._last_used.setdefault(file_id, created_at or 0)
+                    elif now - (created_at or 0) >= self.lease:
+                        stale.append(file_id)
+        except Exception:
+            logger.exception('Listing assistant files failed')
+            return
+        for file_id in stale:
+            self._delete(file_id)
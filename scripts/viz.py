@@ -1,6 +1,9 @@
 import streamlit as st
 import plotly.express as px
 
+from scripts.summary import sentiment_counts as summary_sentiment_counts
+from scripts.timing import timed
+
 
 def sentiment_color(val):
     color_map = {
@@ -30,15 +33,18 @@ def generate_html(label, main_value, sub_label, sub_value, always_show_subtext=F
     """
     st.markdown(html_code, unsafe_allow_html=True)
 
-def metrics(location_count_total, review_count_total, avg_rating_total, filtered_data, show_pie=False):    
-    # Metrics for all
-    all_review_count = review_count_total
-    all_avg_rating = avg_rating_total
-    all_unique_locations = location_count_total
+@timed('viz.metrics')
+def metrics(brand_summary, filtered_data, show_pie=False):    
+    # Metrics for all, looked up in the per-brand summary
+    all_review_count = brand_summary['REVIEW_COUNT']
+    all_avg_rating = brand_summary['AVG_RATING']
+    all_unique_locations = brand_summary['LOCATION_COUNT']
     
     # Metrics for filtered
     filtered_review_count = len(filtered_data)
-    filtered_avg_rating = filtered_data['RATING'].mean() if filtered_review_count > 0 else 0
+    # The filtered reviews are a subset of the brand's, so the same count means no filter is active
+    unfiltered = filtered_review_count == all_review_count
+    filtered_avg_rating = all_avg_rating if unfiltered else filtered_data['RATING'].mean() if filtered_review_count > 0 else 0
     filtered_unique_locations = filtered_data['PLACE_ID'].nunique()
 
     with st.container(border=True):
@@ -57,7 +63,7 @@ def metrics(location_count_total, review_count_total, avg_rating_total, filtered
                 st.markdown(html_code, unsafe_allow_html=True)
 
                 word_rating_colors = {'Negative': '#EA4335', 'Mixed': '#FBBC05', 'Unknown': '#B3B3B3', 'Positive': '#34A853'}
-                sentiment_counts = filtered_data['OVERALL_SENTIMENT'].value_counts()
+                sentiment_counts = summary_sentiment_counts(brand_summary) if unfiltered else filtered_data['OVERALL_SENTIMENT'].value_counts()
                 fig_sentiment_donut = px.pie(
                     sentiment_counts,
                     values=sentiment_counts.values,
@@ -1,20 +1,25 @@
 # streamlit_app.py
+import os
 import streamlit as st
 import pandas as pd
 
+from collections import OrderedDict
+from importlib import import_module
 from streamlit_option_menu import option_menu
 
-from scripts.about import introduction
-from scripts.locations import locations
-from scripts.overview import overview
-from scripts.ai_analysis import ai_analysis
-from scripts.support import support
-from scripts.openai import assistant
+from scripts.sapi import get_refresher
+from scripts.attributes import finish, get_rules, read_attribute_counts
+from scripts.geo import get_spatial_index
+from scripts.session import estimate_session_bytes
+from scripts.timing import finish_rerun, gauge, sink_enabled, span, start_rerun
 
-from scripts.sapi import read_data
-from scripts.viz import metrics
+
+def load(module, name):
+    # Tab and data source modules pull in heavy dependencies, so they are only imported once their tab or source is used
+    return getattr(import_module(f'scripts.{module}'), name)
 
 st.set_page_config(layout="wide")
+start_rerun()
 
 ASSISTANT_ID=st.secrets['ASSISTANT_ID']
 FILE_ID=st.secrets['FILE_ID']
@@ -33,25 +38,72 @@ if 'instruction' not in st.session_state:
 if 'regenerate_clicked' not in st.session_state:
     st.session_state.regenerate_clicked = False
 if 'generated_responses' not in st.session_state:
-    st.session_state['generated_responses'] = {}
+    st.session_state['generated_responses'] = OrderedDict()
+if 'chat_pages' not in st.session_state:
+    st.session_state.chat_pages = 1
+if 'attached_file_id' not in st.session_state:
+    st.session_state.attached_file_id = None
+if 'deferred_tasks' not in st.session_state:
+    st.session_state.deferred_tasks = []
 
-options = ['About', 'Locations', 'Overview', 'AI Analysis', 'Support', 'Assistant']
-icons=['info-circle', 'pin-map-fill', 'people', 'file-bar-graph', 'chat-heart', 'robot']
+options = ['About', 'Locations', 'Overview', 'AI Analysis', 'Support', 'Assistant', 'Alerts']
+icons=['info-circle', 'pin-map-fill', 'people', 'file-bar-graph', 'chat-heart', 'robot', 'bell']
 
 menu_id = option_menu(None, options=options, icons=icons, key='menu_id', orientation="horizontal")
 
-locations_data = pd.read_csv(st.secrets['locations_path']) #read_data('out.c-257-qsr-demo.LOCATIONS') #('/data/in/tables/location_review.csv')
-reviews_data = read_data(st.secrets['reviews_path'])
-sentences_data = pd.read_csv(st.secrets['sentences_path']) #read_data('out.c-257-qsr-demo.REVIEW_SENTENCE')
-entities_data = pd.read_csv(st.secrets['entities_path']) #read_data('out.c-257-qsr-demo.REVIEW_ENTITY')
-attributes = pd.read_csv(st.secrets['attributes_path']) #'entity_attribute_counts.csv') #'/data/in/tables/relations.csv')
-bot_data = pd.read_csv(st.secrets['bot_path'])
+# With a shared Arrow store, every table is memory-mapped from the files written by scripts.shared_data
+SHARED_ROOT = st.secrets.get('shared_data_root')
+# With a partitioned Parquet store, locations and reviews are read per brand once it is selected
+PARQUET_ROOT = None if SHARED_ROOT else st.secrets.get('parquet_root')
+# The SQL backend queries the Parquet store directly and only materializes the filtered reviews
+SQL_BACKEND = bool(PARQUET_ROOT) and load('backend', 'sql_enabled')()
+# A store kept up to date by scripts.attributes already holds the normalized entity-attribute counts
+ATTRIBUTES_STORE = st.secrets.get('attributes_store')
+if SHARED_ROOT:
+    with span('load.shared'):
+        manifest = load('shared_data', 'read_manifest')(SHARED_ROOT)
+        locations_data, reviews_data, sentences_data, entities_data, attributes, bot_data = (
+            load('shared_data', 'load_shared')(SHARED_ROOT, name, manifest['version']) for name in load('shared_data', 'TABLES'))
+        reviews_loaded_at = pd.Timestamp(manifest['written_at'])
+else:
+    if not PARQUET_ROOT:
+        with span('load.locations'):
+            locations_data = pd.read_csv(st.secrets['locations_path']) #read_data('out.c-257-qsr-demo.LOCATIONS') #('/data/in/tables/location_review.csv')
+        with span('load.reviews'):
+            # Served from the last good snapshot while a background thread keeps it fresh
+            with st.spinner('Loading data...🍟🍔🧋'):
+                reviews_data, reviews_loaded_at = get_refresher(st.secrets['reviews_path'], 'REVIEW_ID').snapshot()
+    with span('load.sentences'):
+        sentences_data = pd.read_csv(st.secrets['sentences_path']) #read_data('out.c-257-qsr-demo.REVIEW_SENTENCE')
+    with span('load.entities'):
+        entities_data = pd.read_csv(st.secrets['entities_path']) #read_data('out.c-257-qsr-demo.REVIEW_ENTITY')
+    if not ATTRIBUTES_STORE:
+        with span('load.attributes'):
+            attributes = pd.read_csv(st.secrets['attributes_path']) #'entity_attribute_counts.csv') #'/data/in/tables/relations.csv')
+    with span('load.bot'):
+        bot_data = pd.read_csv(st.secrets['bot_path'])
+
+if ATTRIBUTES_STORE:
+    with span('load.attributes'):
+        attributes = read_attribute_counts(ATTRIBUTES_STORE)
+else:
+    with span('attributes.normalize'):
+        attributes = finish(attributes, get_rules(st.secrets.get('attribute_rules')))
 
-attributes['entity'] = attributes['entity'].replace('burgers', 'burger')
-pronouns_to_remove = ['i', 'you', 'she', 'he', 'it', 'we', 'they', 'I', 'You', 'She', 'He', 'It', 'We', 'They', 'whataburger', 'Whataburger']
-attributes = attributes[~attributes['entity'].isin(pronouns_to_remove)]
-attributes = attributes.groupby(['entity', 'attribute'])['count'].sum().reset_index()
-attributes = attributes[attributes['count'] > 2]
+# Brand totals only change with the data, so reruns look the selected brand up instead of merging all reviews
+with span('load.brand_summary'):
+    if PARQUET_ROOT:
+        brand_summaries = load('summary', 'load_store_summary')(PARQUET_ROOT, SQL_BACKEND)
+    else:
+        # The locations CSV is read on every rerun, so it is part of the CSV version: by modification time when it is a
+        # local file, otherwise (a URL) by a hash of the small locations table
+        if SHARED_ROOT:
+            version = manifest['version']
+        elif os.path.isfile(st.secrets['locations_path']):
+            version = (reviews_loaded_at, os.path.getmtime(st.secrets['locations_path']))
+        else:
+            version = (reviews_loaded_at, int(pd.util.hash_pandas_object(locations_data, index=False).sum()))
+        brand_summaries = load('summary', 'get_brand_summary')(locations_data, reviews_data, version)
 
 ## LOGO
 st.sidebar.markdown(
@@ -64,125 +116,193 @@ st.sidebar.markdown(
 )
 
 ## FILTERS
-# Brand Selection
-brand_options = locations_data['BRAND'].unique().tolist()
-brand = st.sidebar.selectbox('Select a brand', brand_options, index=0, placeholder='All')
-locations_data = locations_data[locations_data['BRAND'] == brand]
-location_count_total = len(locations_data)
-data_collected_at = locations_data['DATA_COLLECTED_AT'].max()
-
-# Merge locations and reviews data and get the count of reviews data based on selected brand
-merged_data = pd.merge(locations_data, reviews_data, on='PLACE_ID', how='inner')
-review_count_total = len(merged_data[merged_data['BRAND'] == brand])
-avg_rating_total = merged_data['RATING'].mean().round(2)
-
-# State Selection
-state_options = sorted(locations_data['STATE'].unique().tolist())
-state = st.sidebar.multiselect('Select a state', state_options, placeholder='All')
-if len(state) > 0:
-    selected_state = state
-else:
-    selected_state = state_options
-locations_data = locations_data[locations_data['STATE'].isin(selected_state)]
-
-# City Selection
-city_options = sorted(locations_data['CITY'].unique().tolist())
-city = st.sidebar.multiselect('Select a city', city_options, placeholder='All')
-if len(city) > 0:
-    selected_city = city
-    location_options = sorted(locations_data[locations_data['CITY'].isin(selected_city)]['ADDRESS'].unique().tolist())
-else:
-    selected_city = city_options
-    location_options = sorted(locations_data[locations_data['STATE'].isin(selected_state)]['ADDRESS'].unique().tolist())
-locations_data = locations_data[locations_data['CITY'].isin(selected_city)]
-
-# Location Selection
-location = st.sidebar.multiselect('Select a location', location_options, placeholder='All')
-if len(location) > 0:
-    selected_location = location
-else:
-    selected_location = location_options
-locations_data = locations_data[locations_data['ADDRESS'].isin(selected_location)]
+with span('filters'):
+    # Brand Selection
+    brand_options = load('storage', 'list_brands')(PARQUET_ROOT) if PARQUET_ROOT else locations_data['BRAND'].unique().tolist()
+    brand = st.sidebar.selectbox('Select a brand', brand_options, index=0, placeholder='All')
+    if SQL_BACKEND:
+        locations_data = load('storage', 'load_locations')(PARQUET_ROOT, brand)
+    elif PARQUET_ROOT:
+        with span('load.partitions'):
+            locations_data = load('storage', 'load_locations')(PARQUET_ROOT, brand)
+            # The date selection from the previous run decides which month partitions are read
+            start, end = load('storage', 'pushdown_range')(st.session_state.get('date_selection'))
+            reviews_data = load('storage', 'load_reviews')(PARQUET_ROOT, brand, start, end)
+    else:
+        locations_data = locations_data[locations_data['BRAND'] == brand]
+    # Every location of the brand, before the location filters below narrow it down
+    brand_place_ids = locations_data['PLACE_ID']
+    brand_summary = brand_summaries.loc[brand]
+    data_collected_at = brand_summary['DATA_COLLECTED_AT']
 
-# Filter reviews based on selected locations
-filtered_reviews = reviews_data[reviews_data['PLACE_ID'].isin(locations_data['PLACE_ID'])]
+    # Nearby Selection
+    nearby_options = sorted(locations_data['ADDRESS'].unique().tolist())
+    nearby = st.sidebar.selectbox('Select stores near', nearby_options, index=None, placeholder='Anywhere')
+    if nearby is not None:
+        anchor = locations_data[locations_data['ADDRESS'] == nearby].iloc[0]
+        spatial_index = get_spatial_index(locations_data[['PLACE_ID', 'LATITUDE', 'LONGITUDE']])
+        nearby_mode = st.sidebar.radio('Nearby', ['Within miles', 'Nearest stores'], horizontal=True, label_visibility='collapsed')
+        if nearby_mode == 'Within miles':
+            miles = st.sidebar.number_input('Miles', min_value=1, max_value=500, value=25, label_visibility='collapsed')
+            nearby_ids, _ = spatial_index.within(anchor['LATITUDE'], anchor['LONGITUDE'], miles)
+        else:
+            store_count = st.sidebar.number_input('Stores', min_value=1, max_value=100, value=10, label_visibility='collapsed')
+            # The selected store itself comes first
+            nearby_ids, _ = spatial_index.nearest(anchor['LATITUDE'], anchor['LONGITUDE'], store_count + 1)
+        locations_data = locations_data[locations_data['PLACE_ID'].isin(nearby_ids)]
 
-# Sentiment Selection
-sentiment_options = sorted(filtered_reviews['OVERALL_SENTIMENT'].unique().tolist())
-sentiment = st.sidebar.multiselect('Select a sentiment', sentiment_options, placeholder='All')
-if len(sentiment) > 0:
-    selected_sentiment = sentiment
-else:
-    selected_sentiment = sentiment_options
-filtered_reviews = filtered_reviews[filtered_reviews['OVERALL_SENTIMENT'].isin(selected_sentiment)]
-
-# Rating Selection
-rating_options = sorted(filtered_reviews['RATING'].unique().tolist())
-rating = st.sidebar.multiselect('Select a review rating', rating_options, placeholder='All')
-if len(rating) > 0:
-    selected_rating = rating
-else:
-    selected_rating = rating_options
-filtered_reviews = filtered_reviews[filtered_reviews['RATING'].isin(selected_rating)]
-
-# Date Selection
-date_options = ['Last Week', 'Last Month', 'Last 3 Months', 'All Time', 'Other']
-date_selection = st.sidebar.selectbox('Select a date', date_options, index=None, placeholder='All')
-min_date = pd.to_datetime(filtered_reviews['REVIEW_DATE'].min())
-max_date = pd.to_datetime(filtered_reviews['REVIEW_DATE'].max())
-
-if date_selection is None:
-    start_date = min_date
-    end_date = max_date
-elif date_selection == 'Other':
-    start_date, end_date = st.sidebar.slider('Select date range', value=[min_date.date(), max_date.date()], min_value=min_date.date(), max_value=max_date.date(), key='date_input')
-    start_date = pd.to_datetime(start_date)  # Convert to Timestamp
-    end_date = pd.to_datetime(end_date).replace(hour=23, minute=59)  # Convert to Timestamp and set time to 23:59
-else:
-    end_date = pd.to_datetime('today')
-    if date_selection == 'Last Week':
-        start_date = end_date - pd.DateOffset(weeks=1)
-    elif date_selection == 'Last Month':
-        start_date = end_date - pd.DateOffset(months=1)
-    elif date_selection == 'Last 3 Months':
-        start_date = end_date - pd.DateOffset(months=3)
-    elif date_selection == 'All Time':
+    # State Selection
+    state_options = sorted(locations_data['STATE'].unique().tolist())
+    state = st.sidebar.multiselect('Select a state', state_options, placeholder='All')
+    if len(state) > 0:
+        selected_state = state
+    else:
+        selected_state = state_options
+    locations_data = locations_data[locations_data['STATE'].isin(selected_state)]
+
+    # City Selection
+    city_options = sorted(locations_data['CITY'].unique().tolist())
+    city = st.sidebar.multiselect('Select a city', city_options, placeholder='All')
+    if len(city) > 0:
+        selected_city = city
+        location_options = sorted(locations_data[locations_data['CITY'].isin(selected_city)]['ADDRESS'].unique().tolist())
+    else:
+        selected_city = city_options
+        location_options = sorted(locations_data[locations_data['STATE'].isin(selected_state)]['ADDRESS'].unique().tolist())
+    locations_data = locations_data[locations_data['CITY'].isin(selected_city)]
+
+    # Location Selection
+    location = st.sidebar.multiselect('Select a location', location_options, placeholder='All')
+    if len(location) > 0:
+        selected_location = location
+    else:
+        selected_location = location_options
+    locations_data = locations_data[locations_data['ADDRESS'].isin(selected_location)]
+
+    # Filter reviews based on selected locations
+    if SQL_BACKEND:
+        filtered_reviews = load('backend', 'ReviewsQuery')(PARQUET_ROOT, brand, locations_data['PLACE_ID'])
+    else:
+        filtered_reviews = reviews_data[reviews_data['PLACE_ID'].isin(locations_data['PLACE_ID'])]
+
+    # The same helpers filter a frame or, with the SQL backend, a query against the store
+    unique_values, keep_values, date_bounds = (load('backend', name) for name in ('unique_values', 'keep_values', 'date_bounds'))
+
+    # Sentiment Selection
+    sentiment_options = sorted(unique_values(filtered_reviews, 'OVERALL_SENTIMENT'))
+    sentiment = st.sidebar.multiselect('Select a sentiment', sentiment_options, placeholder='All')
+    if len(sentiment) > 0:
+        selected_sentiment = sentiment
+    else:
+        selected_sentiment = sentiment_options
+    filtered_reviews = keep_values(filtered_reviews, 'OVERALL_SENTIMENT', selected_sentiment)
+
+    # Rating Selection
+    rating_options = sorted(unique_values(filtered_reviews, 'RATING'))
+    rating = st.sidebar.multiselect('Select a review rating', rating_options, placeholder='All')
+    if len(rating) > 0:
+        selected_rating = rating
+    else:
+        selected_rating = rating_options
+    filtered_reviews = keep_values(filtered_reviews, 'RATING', selected_rating)
+
+    # Date Selection
+    date_options = ['Last Week', 'Last Month', 'Last 3 Months', 'All Time', 'Other']
+    date_selection = st.sidebar.selectbox('Select a date', date_options, index=None, placeholder='All', key='date_selection')
+    min_date, max_date = date_bounds(filtered_reviews)
+
+    if date_selection is None:
         start_date = min_date
+        end_date = max_date
+    elif date_selection == 'Other':
+        start_date, end_date = st.sidebar.slider('Select date range', value=[min_date.date(), max_date.date()], min_value=min_date.date(), max_value=max_date.date(), key='date_input')
+        start_date = pd.to_datetime(start_date)  # Convert to Timestamp
+        end_date = pd.to_datetime(end_date).replace(hour=23, minute=59)  # Convert to Timestamp and set time to 23:59
+    else:
+        end_date = pd.to_datetime('today')
+        if date_selection == 'Last Week':
+            start_date = end_date - pd.DateOffset(weeks=1)
+        elif date_selection == 'Last Month':
+            start_date = end_date - pd.DateOffset(months=1)
+        elif date_selection == 'Last 3 Months':
+            start_date = end_date - pd.DateOffset(months=3)
+        elif date_selection == 'All Time':
+            start_date = min_date
+
+    selected_date_range = (start_date, end_date)
+
+    if SQL_BACKEND:
+        with span('sql.filtered_reviews'):
+            filtered_reviews = filtered_reviews.between(*selected_date_range).fetch()
+        # Support saves edits against the loaded review rows
+        reviews_data = filtered_reviews
 
-selected_date_range = (start_date, end_date)
+    # Convert REVIEW_DATE to datetime for comparison
+    filtered_reviews['REVIEW_DATE'] = pd.to_datetime(filtered_reviews['REVIEW_DATE'])
+    filtered_reviews = filtered_reviews[filtered_reviews['REVIEW_DATE'].between(selected_date_range[0], selected_date_range[1])]
 
-# Convert REVIEW_DATE to datetime for comparison
-filtered_reviews['REVIEW_DATE'] = pd.to_datetime(filtered_reviews['REVIEW_DATE'])
-filtered_reviews = filtered_reviews[filtered_reviews['REVIEW_DATE'].between(selected_date_range[0], selected_date_range[1])]
 
-filtered_locations_with_reviews = filtered_reviews.merge(locations_data, on='PLACE_ID', how='inner')
-sentences_data_filtered = sentences_data[sentences_data['REVIEW_ID'].isin(filtered_locations_with_reviews['REVIEW_ID'])]
+with span('merge.filtered'):
+    filtered_locations_with_reviews = filtered_reviews.merge(locations_data, on='PLACE_ID', how='inner')
+    sentences_data_filtered = sentences_data[sentences_data['REVIEW_ID'].isin(filtered_locations_with_reviews['REVIEW_ID'])]
 
 if filtered_locations_with_reviews.empty:
     st.info('No data available for the selected filters.', icon=':material/info:')
+    finish_rerun(menu_id=menu_id, brand=brand)
     st.stop()
 
 st.sidebar.divider()
-st.sidebar.caption(f"**Data last updated on:** {data_collected_at}.")
+if PARQUET_ROOT:
+    st.sidebar.caption(f"**Data last updated on:** {data_collected_at}.")
+else:
+    reviews_age = int((pd.Timestamp.now(tz=reviews_loaded_at.tz) - reviews_loaded_at).total_seconds() // 60)
+    st.sidebar.caption(f"**Data last updated on:** {data_collected_at}. **Reviews synced:** {reviews_age} min ago.")
 
 ## TABS
-if menu_id == 'About':
-    introduction()
+# Timings are also written when a tab stops or reruns the script early
+try:
+    if menu_id == 'About':
+        load('about', 'introduction')()
     
-if menu_id == 'Locations':    
-    metrics(location_count_total, review_count_total, avg_rating_total, filtered_locations_with_reviews)
-    locations(filtered_locations_with_reviews)
+    if menu_id == 'Locations':    
+        load('viz', 'metrics')(brand_summary, filtered_locations_with_reviews)
+        load('locations', 'locations')(filtered_locations_with_reviews)
+
+    if menu_id == 'Overview':
+        load('viz', 'metrics')(brand_summary, filtered_locations_with_reviews)
+        load('overview', 'overview')(filtered_locations_with_reviews)
 
-if menu_id == 'Overview':
-    metrics(location_count_total, review_count_total, avg_rating_total, filtered_locations_with_reviews)
-    overview(filtered_locations_with_reviews)
+    if menu_id == 'AI Analysis':
+        load('viz', 'metrics')(brand_summary, filtered_locations_with_reviews, show_pie=True)
+        load('ai_analysis', 'ai_analysis')(filtered_locations_with_reviews, attributes, sentences_data_filtered, entities_data)
 
-if menu_id == 'AI Analysis':
-    metrics(location_count_total, review_count_total, avg_rating_total, filtered_locations_with_reviews, show_pie=True)
-    ai_analysis(filtered_locations_with_reviews, attributes, sentences_data_filtered, entities_data)
+    if menu_id == 'Support':
+        # Parquet stores are read once per process, the other sources pass the version of their reviews
+        reviews_version = None if PARQUET_ROOT else manifest['version'] if SHARED_ROOT else reviews_loaded_at
+        load('support', 'support')(filtered_locations_with_reviews, reviews_data, sentences_data_filtered, entities_data,
+                                   brand, brand_place_ids, reviews_version)
 
-if menu_id == 'Support':
-    support(filtered_locations_with_reviews, reviews_data)
+    if menu_id == 'Assistant':
+        assistant = load('openai', 'assistant')
+        # The Assistant works on the slice matching the sidebar filters
+        bot_data_filtered = bot_data[bot_data['REVIEW_ID'].isin(filtered_locations_with_reviews['REVIEW_ID'])]
+        assistant(file_id=st.secrets['FILE_ID'], assistant_id=st.secrets['ASSISTANT_ID'], bot_data=bot_data_filtered,
+                  is_filtered=len(bot_data_filtered) < len(bot_data))
 
-if menu_id == 'Assistant':
-    assistant(file_id=st.secrets['FILE_ID'], assistant_id=st.secrets['ASSISTANT_ID'], bot_data=bot_data)
\ No newline at end of file
+    if menu_id == 'Alerts':
+        # The Parquet modes only hold the pushed-down months or the filtered rows, so the monitor reads the whole brand itself
+        if PARQUET_ROOT:
+            alert_reviews = load('storage', 'load_reviews')(PARQUET_ROOT, brand, columns=load('alerts', 'COLUMNS'))
+        else:
+            alert_reviews = reviews_data
+        # Parquet stores are read once per process, so there the brand alone identifies the batch
+        alert_version = brand if PARQUET_ROOT else manifest['version'] if SHARED_ROOT else reviews_loaded_at
+        # Rolling windows are kept over all reviews of the source, the view shows the selected locations
+        load('alerts', 'alerts')(alert_reviews, locations_data, SHARED_ROOT or PARQUET_ROOT or st.secrets['reviews_path'], alert_version)
+finally:
+    # Walking the whole session state grows with the session, so it only runs when timings are logged or shown
+    if sink_enabled():
+        session_bytes = estimate_session_bytes()
+        gauge('session.total_bytes', sum(session_bytes.values()))
+        gauge('session.largest_keys', dict(sorted(session_bytes.items(), key=lambda item: -item[1])[:5]))
+    finish_rerun(menu_id=menu_id, brand=brand)
\ No newline at end of file
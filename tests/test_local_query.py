@@ -0,0 +1,50 @@
+import pandas as pd
+
+from scripts.local_query import ROW_LIMIT, answer_question
+
+
+def reviews():
+    days = pd.date_range('2024-01-01', periods=120, freq='D')
+    return pd.DataFrame({
+        'REVIEW_ID': range(120),
+        'REVIEW_DATE': days.strftime('%Y-%m-%d'),
+        'RATING': [1, 5, 4] * 40,
+        'REVIEW_DETAILED_FOOD': [2, 5, 4] * 40,
+        'OVERALL_SENTIMENT': ['Negative', 'Positive', 'Positive'] * 40,
+        'STATE': ['TX', 'TX', 'NM'] * 40,
+        'CITY': ['Austin', 'Austin', 'Santa Fe'] * 40,
+    })
+
+
+def test_average_rating_of_a_sentiment():
+    text, table = answer_question('average rating of negative reviews', reviews())
+    assert text == 'The average rating of negative reviews is **1.00** across 40 reviews.'
+    assert table is None
+
+
+def test_average_detailed_rating_of_a_sentiment():
+    text, _ = answer_question('average food rating of negative reviews', reviews())
+    assert text == 'The average food rating of negative reviews is **2.00** across 40 reviews.'
+
+
+def test_average_rating_of_a_sentiment_per_state():
+    text, table = answer_question('what is the average rating for positive reviews per state', reviews())
+    assert text == 'Here is the average rating of positive reviews per state.'
+    assert dict(zip(table['State'], table['Average rating of positive reviews'])) == {'TX': 5.0, 'NM': 4.0}
+
+
+def test_sentiment_count():
+    text, _ = answer_question('how many negative reviews', reviews())
+    assert text == 'The number of negative reviews is **40**.'
+
+
+def test_count_and_average_goes_to_the_assistant():
+    assert answer_question('how many average negative reviews', reviews()) is None
+
+
+def test_periods_keep_the_most_recent_rows():
+    text, table = answer_question('average rating per day', reviews())
+    assert len(table) == ROW_LIMIT
+    assert table['Day'].iloc[-1] == '2024-04-29'
+    assert table['Day'].iloc[0] == '2024-03-11'
+    assert text.endswith(f'Only the most recent {ROW_LIMIT} of 120 days are shown.')